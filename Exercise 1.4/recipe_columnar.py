@@ -0,0 +1,287 @@
+import os
+import sys
+import mmap
+import struct
+from array import array
+from recipe_index import new_index, add_to_index
+
+# The difficulty rules and the ingredient dictionary are shared by every
+# exercise: they live at the top of the repository
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from recipe_difficulty import DIFFICULTY_LEVELS, score_batch
+from recipe_dictionary import IngredientDictionary, unique_names
+
+# Columnar recipe file, read in place through mmap.
+#
+# Layout (version 1):
+#   header    magic, version, byte order, recipe count, ingredient count,
+#             merged segments, then (offset, length) of every section below
+#   sections  8-byte aligned, each one a flat column:
+#     cooking_time        uint32 per recipe
+#     difficulty          uint8 per recipe (index into DIFFICULTY_LEVELS)
+#     name_offsets        uint64 per recipe + 1, into name_data
+#     name_data           UTF-8 names, back to back
+#     ingredient_offsets  uint64 per recipe + 1, into ingredient_ids
+#     ingredient_ids      uint32 ingredient ids of every recipe, in the order
+#                         the recipe lists its ingredients
+#     vocab_offsets       uint64 per ingredient + 1, into vocab_data
+#     vocab_data          UTF-8 ingredient names, in first-seen order (the
+#                         names of an IngredientDictionary)
+#     posting_offsets     uint64 per ingredient + 1, into posting_positions
+#     posting_positions   uint32 recipe positions using each ingredient
+#
+# Opening the file only parses the header; a column is a memoryview over the
+# mapped file, so nothing is decoded until a recipe is actually asked for.
+
+MAGIC = b'RCOLUMN\x00'
+VERSION = 1
+SECTIONS = (
+    'cooking_time', 'difficulty', 'name_offsets', 'name_data',
+    'ingredient_offsets', 'ingredient_ids', 'vocab_offsets', 'vocab_data',
+    'posting_offsets', 'posting_positions'
+)
+SECTION_TYPES = {
+    'cooking_time': 'I', 'difficulty': 'B', 'name_offsets': 'Q', 'name_data': 'B',
+    'ingredient_offsets': 'Q', 'ingredient_ids': 'I', 'vocab_offsets': 'Q',
+    'vocab_data': 'B', 'posting_offsets': 'Q', 'posting_positions': 'I'
+}
+HEADER = struct.Struct('<8sIBxxxQQQ' + 'QQ' * len(SECTIONS))
+BYTE_ORDERS = {'little': 0, 'big': 1}
+
+
+def columnar_filename(filename):
+    """Return the name of the columnar copy of a recipe store"""
+    return filename + '.col'
+
+
+def string_column(strings):
+    # Encode strings into an (offsets, data) pair of columns
+    offsets = array('Q', [0])
+    data = bytearray()
+    for string in strings:
+        data += string.encode('utf-8')
+        offsets.append(len(data))
+    return offsets, data
+
+
+def write_columnar(filename, recipes_list, merged_segments=0):
+    """Write recipes to a columnar file (atomically replacing any old one)"""
+    dictionary = IngredientDictionary()
+    cooking_time = array('I')
+    difficulty = bytearray()
+    ingredient_offsets = array('Q', [0])
+    ids = array('I')
+    name_offsets = array('Q', [0])
+    name_data = bytearray()
+    # One pass only, so 'recipes_list' may be a stream of recipes
+    for recipe in recipes_list:
+        name_data += recipe['name'].encode('utf-8')
+        name_offsets.append(len(name_data))
+        cooking_time.append(recipe['cooking_time'])
+        difficulty.append(DIFFICULTY_LEVELS.index(recipe['difficulty']))
+        # In the recipe's own order, so it reads the same after compaction
+        ids.extend(dictionary.add(name) for name in unique_names(recipe['ingredients']))
+        ingredient_offsets.append(len(ids))
+
+    # Posting lists, grouped per ingredient id
+    recipe_count = len(cooking_time)
+    postings = [array('I') for _ in range(len(dictionary))]
+    for position in range(recipe_count):
+        start, end = ingredient_offsets[position], ingredient_offsets[position + 1]
+        for ingredient_id in ids[start:end]:
+            postings[ingredient_id].append(position)
+    posting_offsets = array('Q', [0])
+    posting_positions = array('I')
+    for positions in postings:
+        posting_positions.extend(positions)
+        posting_offsets.append(len(posting_positions))
+
+    vocab_offsets, vocab_data = string_column(dictionary.names)
+    columns = {
+        'cooking_time': cooking_time, 'difficulty': difficulty,
+        'name_offsets': name_offsets, 'name_data': name_data,
+        'ingredient_offsets': ingredient_offsets, 'ingredient_ids': ids,
+        'vocab_offsets': vocab_offsets, 'vocab_data': vocab_data,
+        'posting_offsets': posting_offsets, 'posting_positions': posting_positions
+    }
+
+    # Lay the sections out one after another, 8-byte aligned
+    layout = []
+    offset = HEADER.size
+    for section in SECTIONS:
+        offset += -offset % 8
+        length = len(memoryview(columns[section]).cast('B'))
+        layout += [offset, length]
+        offset += length
+
+    temp_name = filename + '.tmp'
+    with open(temp_name, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, BYTE_ORDERS[sys.byteorder], recipe_count,
+                               len(dictionary), merged_segments, *layout))
+        for section in SECTIONS:
+            file.write(b'\x00' * (-file.tell() % 8))
+            file.write(memoryview(columns[section]).cast('B'))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_name, filename)
+
+
+class ColumnarRecipes:
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.stat = os.fstat(file.fileno())
+        self.view = memoryview(self.map)
+        fields = HEADER.unpack_from(self.view)
+        magic, version, byte_order = fields[:3]
+        if magic != MAGIC:
+            raise ValueError(f"{filename} is not a columnar recipe file")
+        if version != VERSION:
+            raise ValueError(f"Unsupported columnar file version {version}")
+        if byte_order != BYTE_ORDERS[sys.byteorder]:
+            raise ValueError(f"{filename} was written on a machine with a different byte order")
+        self.recipe_count, self.ingredient_count, self.merged_segments = fields[3:6]
+        self.columns = {}
+        for i, section in enumerate(SECTIONS):
+            offset, length = fields[6 + 2 * i], fields[7 + 2 * i]
+            # A view into the mapped file: no copy, nothing decoded
+            self.columns[section] = self.view[offset:offset + length].cast(SECTION_TYPES[section])
+
+    def __len__(self):
+        return self.recipe_count
+
+    def string(self, offsets, data, i):
+        # Decode string number i out of an (offsets, data) pair of columns
+        return bytes(self.columns[data][self.columns[offsets][i]:self.columns[offsets][i + 1]]).decode('utf-8')
+
+    def ingredient_name(self, ingredient_id):
+        return self.string('vocab_offsets', 'vocab_data', ingredient_id)
+
+    def all_ingredients(self):
+        return [self.ingredient_name(i) for i in range(self.ingredient_count)]
+
+    def recipe_ingredient_ids(self, position):
+        offsets = self.columns['ingredient_offsets']
+        return self.columns['ingredient_ids'][offsets[position]:offsets[position + 1]]
+
+    def positions(self, ingredient_id):
+        """Return the positions of the recipes using an ingredient (zero-copy)"""
+        offsets = self.columns['posting_offsets']
+        return self.columns['posting_positions'][offsets[ingredient_id]:offsets[ingredient_id + 1]]
+
+    def rescore(self, time_threshold, ingredient_threshold):
+        """Return the difficulty codes of every recipe under new thresholds
+
+        Runs in one vectorised pass straight over the mapped columns.
+        """
+        import numpy as np
+
+        ingredient_counts = np.diff(np.frombuffer(self.columns['ingredient_offsets'], dtype=np.uint64))
+        return score_batch(np.frombuffer(self.columns['cooking_time'], dtype=np.uint32),
+                           ingredient_counts, time_threshold, ingredient_threshold)
+
+    def __getitem__(self, position):
+        # Build one recipe dictionary, on demand
+        if not 0 <= position < self.recipe_count:
+            raise IndexError(position)
+        return {
+            'name': self.string('name_offsets', 'name_data', position),
+            'cooking_time': self.columns['cooking_time'][position],
+            'ingredients': [self.ingredient_name(i) for i in self.recipe_ingredient_ids(position)],
+            'difficulty': DIFFICULTY_LEVELS[self.columns['difficulty'][position]]
+        }
+
+    def is_current(self):
+        """Check that the file has not been replaced since it was opened"""
+        try:
+            return os.path.samestat(self.stat, os.stat(self.filename))
+        except FileNotFoundError:
+            return False
+
+    def close(self):
+        for column in self.columns.values():
+            column.release()
+        self.view.release()
+        self.map.close()
+
+
+class ColumnarSnapshot:
+    """Columnar copy of a store plus the recipes appended after it was written"""
+
+    def __init__(self, columns, tail):
+        self.columns = columns
+        self.tail = tail
+        # Ids in the file are the dictionary's ids, except in files written
+        # before the names were canonical, where two spellings of one
+        # ingredient can have an id each: keep the file ids of every one
+        self.dictionary = IngredientDictionary()
+        self.file_ids = []
+        for file_id, name in enumerate(columns.all_ingredients()):
+            ingredient_id = self.dictionary.add(name)
+            if ingredient_id == len(self.file_ids):
+                self.file_ids.append([])
+            self.file_ids[ingredient_id].append(file_id)
+        # Ingredients first seen in the tail get the next ids
+        self.tail_index = add_to_index(new_index(self.dictionary), tail, len(columns))
+        self.all_ingredients = self.dictionary.names
+
+    def __len__(self):
+        return len(self.columns) + len(self.tail)
+
+    def __getitem__(self, position):
+        if position < len(self.columns):
+            return self.columns[position]
+        return self.tail[position - len(self.columns)]
+
+    def usage_counts(self):
+        # Number of recipes using each ingredient id
+        offsets = self.columns.columns['posting_offsets']
+        counts = {ingredient_id: sum(offsets[i + 1] - offsets[i] for i in file_ids)
+                  for ingredient_id, file_ids in enumerate(self.file_ids)}
+        for ingredient_id, positions in self.tail_index['postings'].items():
+            counts[ingredient_id] = counts.get(ingredient_id, 0) + len(positions)
+        return counts
+
+    def get(self, ingredient_id, default=()):
+        # Posting list lookup, shaped like the 'postings' dict of recipe_index
+        file_ids = self.file_ids[ingredient_id] if ingredient_id < len(self.file_ids) else []
+        if len(file_ids) == 1:
+            positions = list(self.columns.positions(file_ids[0]))
+        else:
+            positions = sorted({position for i in file_ids for position in self.columns.positions(i)})
+        positions += self.tail_index['postings'].get(ingredient_id, [])
+        return positions or default
+
+
+def open_columnar(store):
+    """Open the columnar copy of a store together with the newer recipes
+
+    Returns (data, index) shaped like recipe_search expects them.
+    """
+    while True:
+        columns = ColumnarRecipes(columnar_filename(store.filename))
+        try:
+            tail = store.read_tail(columns.merged_segments, columns.is_current)
+        except FileNotFoundError:
+            # Compacted while we were opening it: reopen the new copy
+            columns.close()
+            continue
+        break
+    snapshot = ColumnarSnapshot(columns, tail)
+    data = {'recipes_list': snapshot, 'all_ingredients': snapshot.all_ingredients}
+    index = {'recipe_count': len(snapshot), 'dictionary': snapshot.dictionary, 'postings': snapshot}
+    return data, index
+
+
+if __name__ == "__main__":
+    from recipe_store import RecipeStore, RecipeReader
+
+    # Convert the base file of a recipe store into its columnar copy
+    filename = input("Enter the filename of the recipe store to convert: ")
+    store = RecipeStore(filename)
+    merged_segments = store.read_merged_segments()
+    reader = RecipeReader(store, upto=merged_segments)
+    write_columnar(columnar_filename(filename), reader, merged_segments)
+    reader.close()
+    print(f"Columnar copy written to {columnar_filename(filename)}")
@@ -0,0 +1,78 @@
+import time
+import argparse
+from recipe_store import RecipeStore, RecipeReader
+from recipe_index import get_similarity_index
+
+# Batch job: find recipes that are (nearly) the same, like the copies bulk
+# feeds from different vendors tend to bring in. Recipes are compared by the
+# MinHash index stored next to the recipe file (recipe_similar.py at the top
+# of the repository, needs NumPy), so the job never compares every pair.
+
+# Recipes written to the deduplicated copy per appended batch
+BATCH_SIZE = 5000
+
+def report(reader, groups):
+    """Print each group of duplicates, the oldest recipe first"""
+    for group in groups:
+        print("\n" + "="*50)
+        original = reader[group[0]]
+        print(f"{original['name']} ({', '.join(original['ingredients'])})")
+        for position in group[1:]:
+            recipe = reader[position]
+            print(f"  duplicate: {recipe['name']} ({', '.join(recipe['ingredients'])})")
+
+
+def write_deduplicated(reader, groups, output):
+    """Copy the recipes to a new recipe file, keeping only the oldest of each group"""
+    dropped = {position for group in groups for position in group[1:]}
+    store = RecipeStore(output)
+    batch = []
+    kept = 0
+    for position, recipe in enumerate(reader):
+        if position in dropped:
+            continue
+        batch.append(recipe)
+        kept += 1
+        if len(batch) == BATCH_SIZE:
+            store.append(batch)
+            batch = []
+    if batch:
+        store.append(batch)
+    # One base file (and ingredient index) for the clean copy
+    store.compact()
+    return kept
+
+
+# Main code begins here
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find near-duplicate recipes in a recipe file.")
+    parser.add_argument('filename', help="recipe file")
+    parser.add_argument('--threshold', type=float, default=0.8,
+                        help="share of ingredients and name words two recipes must have in common (default 0.8)")
+    parser.add_argument('--output', metavar='FILE', help="write a copy without the duplicates to this recipe file")
+    parser.add_argument('--quiet', action='store_true', help="only print the totals")
+    args = parser.parse_args()
+
+    store = RecipeStore(args.filename)
+    if not store.exists():
+        parser.error(f"File '{args.filename}' not found.")
+    reader = RecipeReader(store)
+
+    started = time.perf_counter()
+    try:
+        similarity_index = get_similarity_index(args.filename, reader)
+    except ImportError:
+        parser.error("Finding duplicates needs NumPy: pip install numpy")
+    groups = similarity_index.duplicates(args.threshold)
+    elapsed = time.perf_counter() - started
+
+    if not args.quiet:
+        report(reader, groups)
+    duplicates = sum(len(group) - 1 for group in groups)
+    print("\n" + "="*50)
+    print(f"{duplicates} duplicates of {len(groups)} recipes among {len(reader)} ({elapsed:.2f} s)")
+
+    if args.output:
+        kept = write_deduplicated(reader, groups, args.output)
+        print(f"Wrote {kept} recipes to {args.output}")
+    reader.close()
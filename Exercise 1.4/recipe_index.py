@@ -0,0 +1,217 @@
+import os
+import sys
+import pickle
+import threading
+from array import array
+from bisect import bisect_left
+
+# The ingredient dictionary is shared by every exercise: recipe_dictionary.py
+# lives at the top of the repository
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from recipe_dictionary import IngredientDictionary, intersect
+
+# Inverted ingredient index for the recipe file.
+# Every ingredient gets an integer id from the index's IngredientDictionary
+# (so "Olive oil" and "olive  oil" are one ingredient), and each id maps to
+# the sorted positions (in 'recipes_list') of the recipes that use it, so a
+# search only touches the recipes that match.
+
+# Indexes saved before the ingredient dictionary (keyed by name) have no
+# version, and are rebuilt
+INDEX_VERSION = 2
+
+
+def index_filename(filename):
+    """Return the name of the index file stored next to a recipe file"""
+    return filename + '.idx'
+
+
+def new_index(dictionary=None):
+    """Return an empty index, numbering ingredients with 'dictionary' if given"""
+    return {
+        'version': INDEX_VERSION,
+        'recipe_count': 0,
+        'dictionary': dictionary if dictionary is not None else IngredientDictionary(),
+        'postings': {}
+    }
+
+
+def add_to_index(index, recipes, start):
+    """Add recipes to the index, the first one living at position 'start'"""
+    dictionary = index['dictionary']
+    postings = index['postings']
+    # 'recipes' may be any iterable, so count them while going through
+    position = start - 1
+    for position, recipe in enumerate(recipes, start):
+        # A recipe listing the same ingredient twice is only posted once
+        for ingredient_id in dictionary.encode(recipe['ingredients']):
+            if ingredient_id in postings:
+                postings[ingredient_id].append(position)
+            else:
+                postings[ingredient_id] = array('I', [position])
+    index['recipe_count'] = max(index['recipe_count'], position + 1)
+    return index
+
+
+def build_index(recipes_list):
+    """Build a full index from scratch out of a list of recipes"""
+    return add_to_index(new_index(), recipes_list, 0)
+
+
+def load_index(filename):
+    """Load the index of a recipe file, returning None if there is none"""
+    try:
+        with open(index_filename(filename), 'rb') as file:
+            return pickle.load(file)
+    except FileNotFoundError:
+        return None
+    except (EOFError, pickle.UnpicklingError):
+        # Cut short (e.g. by a crash): rebuilt like a missing index
+        return None
+
+
+def save_index(index, filename):
+    """Save the index next to its recipe file"""
+    # Written in full under a name of its own, then swapped in: readers see
+    # the old index or the new one, and two savers don't mix their bytes
+    temp_name = f"{index_filename(filename)}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_name, 'wb') as file:
+        pickle.dump(index, file)
+    os.replace(temp_name, index_filename(filename))
+
+
+def get_index(filename, recipes_list):
+    """Load the index of a recipe file, rebuilding it when missing or stale"""
+    index = load_index(filename)
+    if index is None or index.get('version') != INDEX_VERSION or index['recipe_count'] > len(recipes_list):
+        index = build_index(recipes_list)
+    elif index['recipe_count'] < len(recipes_list):
+        # Recipes appended since it was saved: post just those
+        start = index['recipe_count']
+        add_to_index(index, recipes_list[start:], start)
+    else:
+        return index
+    try:
+        save_index(index, filename)
+    except OSError:
+        # Read-only location: the index still works for this run
+        pass
+    return index
+
+
+def find_positions(index, ingredient):
+    """Return the sorted positions of the recipes that use an ingredient"""
+    ingredient_id = index['dictionary'].get(ingredient)
+    if ingredient_id is None:
+        return []
+    return index['postings'].get(ingredient_id, [])
+
+
+def find_positions_with_all(index, ingredients):
+    """Return the sorted positions of the recipes that use every one of some ingredients"""
+    return intersect(*(find_positions(index, ingredient) for ingredient in ingredients))
+
+
+def all_postings(index):
+    """Return {ingredient id: sorted positions} for every ingredient"""
+    postings = index['postings']
+    if hasattr(postings, 'usage_counts'):
+        # Columnar snapshot: looked up id by id
+        return {ingredient_id: postings.get(ingredient_id, []) for ingredient_id in range(len(index['dictionary']))}
+    return postings
+
+
+def postings_since(index, start):
+    """Return {ingredient id: sorted positions} of the recipes from position 'start' on"""
+    postings = index['postings']
+    if hasattr(postings, 'usage_counts'):
+        if start >= len(postings.columns):
+            # Columnar snapshot: the recipes past its file are in its tail index
+            postings = postings.tail_index['postings']
+        else:
+            postings = all_postings(index)
+    return {ingredient_id: positions[bisect_left(positions, start):]
+            for ingredient_id, positions in postings.items() if len(positions) and positions[-1] >= start}
+
+
+def usage_counts(index):
+    """Return how many recipes use each ingredient"""
+    postings = index['postings']
+    if hasattr(postings, 'usage_counts'):
+        # Columnar snapshot: counted from its offsets, without listing positions
+        counts = postings.usage_counts()
+    else:
+        counts = {ingredient_id: len(positions) for ingredient_id, positions in postings.items()}
+    names = index['dictionary'].names
+    return {names[ingredient_id]: count for ingredient_id, count in counts.items()}
+
+
+def get_similarity_index(filename, recipes_list):
+    """Load the MinHash index of a recipe file, signing recipes added since it was saved
+
+    Needs NumPy, which raises ImportError when missing.
+    """
+    from recipe_similar import SimilarityIndex
+    
+    similarity_filename = filename + '.sim'
+    similarity_index = SimilarityIndex.load(similarity_filename)
+    if similarity_index is None or similarity_index.info.get('recipe_count', 0) > len(recipes_list):
+        similarity_index = SimilarityIndex()
+    start = similarity_index.info.get('recipe_count', 0)
+    if start < len(recipes_list):
+        # Recipes are only ever appended (compaction keeps their positions):
+        # each one is signed once, by position
+        similarity_index.add_many((position, recipes_list[position]['name'], recipes_list[position]['ingredients'])
+                                  for position in range(start, len(recipes_list)))
+        similarity_index.info['recipe_count'] = len(recipes_list)
+        try:
+            similarity_index.save(similarity_filename)
+        except OSError:
+            # Read-only location: the index still works for this run
+            pass
+    return similarity_index
+
+
+def pantry_filename(filename):
+    """Return the name of the pantry bitmap file stored next to a recipe file"""
+    return filename + '.pantry'
+
+
+def save_pantry_index(index, filename):
+    """Save pantry bitmaps for an index next to its recipe file (skipped without NumPy)"""
+    try:
+        from recipe_bitmap import PantryIndex
+    except ImportError:
+        return None
+    pantry_index = PantryIndex(all_postings(index), index['recipe_count'])
+    # The ingredient ids it was built with, to check them when loading
+    pantry_index.info['names'] = list(index['dictionary'].names)
+    pantry_index.save(pantry_filename(filename))
+    return pantry_index
+
+
+def get_pantry_index(filename, index):
+    """Load the pantry bitmaps of a recipe file, adding recipes appended since they were saved
+
+    Needs NumPy, which raises ImportError when missing.
+    """
+    from recipe_bitmap import PantryIndex
+    
+    pantry_index = PantryIndex.load(pantry_filename(filename))
+    names = index['dictionary'].names
+    if (pantry_index is None or len(pantry_index) > index['recipe_count']
+            or pantry_index.info.get('names') != names[:len(pantry_index.info.get('names', []))]):
+        # Missing, or numbering ingredients differently: build it again
+        pantry_index = PantryIndex(all_postings(index), index['recipe_count'])
+    elif len(pantry_index) < index['recipe_count']:
+        # Recipes are only ever appended: add just the new ones
+        pantry_index.extend(postings_since(index, len(pantry_index)), index['recipe_count'])
+    else:
+        return pantry_index
+    pantry_index.info['names'] = list(names)
+    try:
+        pantry_index.save(pantry_filename(filename))
+    except OSError:
+        # Read-only location: the bitmaps still work for this run
+        pass
+    return pantry_index
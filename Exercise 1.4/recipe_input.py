@@ -1,15 +1,27 @@
-import pickle
+import os
+import sys
+import csv
+import json
+import time
+import queue
+import argparse
+import threading
+from recipe_store import RecipeStore, RecipeReader, COMPACT_AFTER_SEGMENTS
+from recipe_index import get_index
+
+# The difficulty rules and the ingredient dictionary are shared by every
+# exercise: they live at the top of the repository
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from recipe_difficulty import calculate_difficulty
+from recipe_dictionary import unique_names
+
+# Batch mode settings
+BATCH_SIZE = 5000
+QUEUE_BATCHES = 4
 
 def calc_difficulty(cooking_time, ingredients):
     """Calculate recipe difficulty based on time and ingredient count"""
-    if cooking_time < 10 and len(ingredients) < 4:
-        return 'Easy'
-    elif cooking_time < 10 and len(ingredients) >= 4:
-        return 'Medium'
-    elif cooking_time >= 10 and len(ingredients) < 4:
-        return 'Intermediate'
-    else:
-        return 'Hard'
+    return calculate_difficulty(cooking_time, len(ingredients))
     
 def take_recipe():
     # Collect recipe information from user and return as dictionary 
@@ -17,8 +29,9 @@ def take_recipe():
     cooking_time = int(input("Enter cooking time (in minutes): "))
     ingredients_input = input("Enter ingredients (separated by commas): ").strip()
     
-    # Convert comma-separated string into a clean list
-    ingredients = [ingredient.strip() for ingredient in ingredients_input.split(',')]
+    # Convert comma-separated string into a clean list, each ingredient once
+    # whatever its case or spacing
+    ingredients = unique_names(ingredients_input.split(','))
     
     # Calculate difficulty using our helper function
     difficulty = calc_difficulty(cooking_time, ingredients)
@@ -34,69 +47,201 @@ def take_recipe():
     return recipe
 
 
-# Main code begins here
-filename = input("Enter the filename to store recipes (e.g., 'recipes.bin'): ")
+def read_rows(file, file_format):
+    """Yield raw rows from a CSV or JSON Lines file
 
-try:
-    # 'rb' = read binary mode
-    file = open(filename, 'rb')  
-    data = pickle.load(file)
-    
-except FileNotFoundError:
-    # File doesn't exist, then new data structure
-    print("File not found. Creating a new recipe file.")
-    data = {
-        'recipes_list': [],
-        'all_ingredients': []
-    }
-    
-except:
-    # For other unexpected error
-    print("An unexpected error occurred. Creating new data.")
-    data = {
-        'recipes_list': [],
-        'all_ingredients': []
-    }
-    
-else:
-    # File was opened successfully, then close it
-    file.close()
-    
-finally:
-    # extract the data into variables, always running
-    recipes_list = data['recipes_list']
-    all_ingredients = data['all_ingredients']
-
-#Second part: Colecting recipes
-# Ask how many recipes to enter
-n = int(input("\nHow many recipes would you like to enter? "))
-
-# Collect recipes
-for i in range(n):
-    print(f"\n--- Recipe {i + 1} ---")
-    recipe = take_recipe()
-    
-    # Add new ingredients to all_ingredients list
-    for ingredient in recipe['ingredients']:
-        if ingredient not in all_ingredients:
-            all_ingredients.append(ingredient)
-    
-    # Add recipe to recipes_list
-    recipes_list.append(recipe)
+    CSV rows come as dictionaries; JSON lines come as text, decoded by
+    parse_recipes so a broken line is skipped like a broken CSV row.
+    """
+    if file_format == 'csv':
+        yield from csv.DictReader(file)
+    else:
+        for line in file:
+            if line.strip():
+                yield line
+
+
+def parse_recipes(rows, errors):
+    """Turn raw rows into recipes, skipping (and counting) the broken ones"""
+    for line_number, row in enumerate(rows, 1):
+        try:
+            if isinstance(row, str):
+                row = json.loads(row)
+            ingredients = row['ingredients']
+            if isinstance(ingredients, str):
+                # CSV (or JSON given as text): comma-separated, as typed by hand
+                ingredients = ingredients.split(',')
+            yield {
+                'name': str(row['name']).strip(),
+                'cooking_time': int(row['cooking_time']),
+                'ingredients': ingredients
+            }
+        except (KeyError, TypeError, ValueError) as error:
+            errors.append(line_number)
+            print(f"Skipping row {line_number}: {error!r}")
+
+
+def normalize_ingredients(recipes):
+    """Strip extra whitespace from ingredients and drop empty or repeated ones
+
+    Ingredients differing only in case ("Salt", "salt") count as repeated.
+    """
+    for recipe in recipes:
+        recipe['ingredients'] = unique_names(recipe['ingredients'])
+        yield recipe
+
+
+def add_difficulty(recipes):
+    """Work out the difficulty of every recipe"""
+    for recipe in recipes:
+        recipe['difficulty'] = calc_difficulty(recipe['cooking_time'], recipe['ingredients'])
+        yield recipe
+
+
+def make_batches(recipes, batch_size):
+    """Group recipes into lists of at most 'batch_size'"""
+    batch = []
+    for recipe in recipes:
+        batch.append(recipe)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
-print("\nAll recipes collected successfully!")
 
+def bulk_load(store, file, file_format, batch_size=BATCH_SIZE):
+    """Stream recipes from a file into the store, one committed batch at a time
 
-# Update the data dictionary with new recipes and ingredients
-data = {
-    'recipes_list': recipes_list,
-    'all_ingredients': all_ingredients
-}
+    Parsing runs on its own thread and hands batches over through a bounded
+    queue: when writing falls behind, the parser waits (backpressure) instead
+    of piling recipes up in memory.
+    """
+    errors = []
+    batches = queue.Queue(maxsize=QUEUE_BATCHES)
+    failure = []
+    # Set when the writer stops early (failed append, Ctrl-C), so the
+    # parser does not wait forever for room in the queue
+    stop = threading.Event()
 
-# Save everything to the file
-# 'wb' = write binary mode
-file = open(filename, 'wb')  
-pickle.dump(data, file)
-file.close()
+    def hand_over(item):
+        # Put an item in the queue, giving up once the writer has stopped
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            recipes = add_difficulty(normalize_ingredients(parse_recipes(read_rows(file, file_format), errors)))
+            for batch in make_batches(recipes, batch_size):
+                if not hand_over(batch):
+                    return
+        except Exception as error:
+            failure.append(error)
+        finally:
+            # Tell the writer there is nothing more to come
+            hand_over(None)
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+
+    total = 0
+    started = time.perf_counter()
+    try:
+        while True:
+            batch = batches.get()
+            if batch is None:
+                break
+            # Each batch is appended and flushed to disk: a committed unit
+            batch_started = time.perf_counter()
+            store.append(batch)
+            total += len(batch)
+            batch_seconds = time.perf_counter() - batch_started
+            elapsed = time.perf_counter() - started
+            print(f"Committed {len(batch)} recipes ({total} total) - "
+                  f"batch {len(batch) / max(batch_seconds, 1e-9):,.0f} rows/s, "
+                  f"overall {total / max(elapsed, 1e-9):,.0f} rows/s")
+    finally:
+        stop.set()
+        producer.join()
+
+    if failure:
+        raise failure[0]
+    elapsed = time.perf_counter() - started
+    print(f"\nLoaded {total} recipes in {elapsed:.2f} s "
+          f"({total / max(elapsed, 1e-9):,.0f} rows/s), skipped {len(errors)} rows.")
+    return total
+
+
+def enter_recipes(filename):
+    """Collect recipes typed in by the user and save them"""
+    # The store only appends new recipes, so the existing ones are never loaded
+    store = RecipeStore(filename)
+    if not store.exists():
+        print("File not found. Creating a new recipe file.")
+
+    #Second part: Colecting recipes
+    # Ask how many recipes to enter
+    n = int(input("\nHow many recipes would you like to enter? "))
+
+    # Collect recipes
+    new_recipes = []
+    for i in range(n):
+        print(f"\n--- Recipe {i + 1} ---")
+        recipe = take_recipe()
+        
+        # Add recipe to the batch being saved
+        new_recipes.append(recipe)
+
+    print("\nAll recipes collected successfully!")
+
+
+    # Append the batch to the store; cost grows with the batch, not the file
+    store.append(new_recipes)
+
+    print(f"\nRecipes saved successfully to {filename}!")
+    return store
+
+
+def compact_if_needed(store):
+    # Fold the log segments back into the base file (and rebuild the ingredient
+    # index) once enough of them have piled up. The thread finishes before exit.
+    if store.segment_count() >= COMPACT_AFTER_SEGMENTS:
+        print("Compacting the recipe file in the background...")
+        store.compact_in_background()
+    else:
+        # Otherwise post the recipes just saved to the ingredient index, so
+        # searches find it up to date
+        reader = RecipeReader(store)
+        get_index(store.filename, reader)
+        reader.close()
+
+
+# Main code begins here
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add recipes to a recipe file.")
+    parser.add_argument('filename', nargs='?', help="recipe file (asked for when missing)")
+    parser.add_argument('--load', metavar='FEED', help="bulk-load recipes from a CSV or JSON Lines file ('-' for stdin)")
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help="feed format (guessed from the extension)")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="recipes per committed batch")
+    args = parser.parse_args()
+
+    filename = args.filename or input("Enter the filename to store recipes (e.g., 'recipes.bin'): ")
+
+    if args.load is None:
+        store = enter_recipes(filename)
+    else:
+        # Batch mode: no questions asked, recipes come from the feed
+        file_format = args.format or ('csv' if args.load.lower().endswith('.csv') else 'jsonl')
+        store = RecipeStore(filename)
+        if args.load == '-':
+            bulk_load(store, sys.stdin, file_format, args.batch_size)
+        else:
+            with open(args.load, newline='', encoding='utf-8') as feed:
+                bulk_load(store, feed, file_format, args.batch_size)
 
-print(f"\nRecipes saved successfully to {filename}!")
\ No newline at end of file
+    compact_if_needed(store)
@@ -1,4 +1,14 @@
-import pickle
+import os
+import sys
+from recipe_store import RecipeStore, RecipeReader
+from recipe_columnar import columnar_filename, open_columnar
+from recipe_index import get_index, get_similarity_index, get_pantry_index, find_positions, usage_counts
+
+# The full-text index is shared by every exercise: recipe_text_search.py
+# lives at the top of the repository
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from recipe_text_search import TextIndex
+from recipe_autocomplete import PrefixIndex, choose
 
 def display_recipe(recipe):
     """Display a single recipe with all its details"""
@@ -12,38 +22,15 @@ def display_recipe(recipe):
         print(f"  - {ingredient}")
     print("="*50)
 
-def search_ingredient(data):
-    """Search for recipes by ingredient"""
-    # Grab the list of all ingredients from data dictionary
-    all_ingredients = data['all_ingredients']
-    
-    # Show the user all ingredients with a number next to each one
-    print("\nAvailable ingredients:")
-    print("-" * 30)
-    for index, ingredient in enumerate(all_ingredients):
-        print(f"{index}: {ingredient}")
-    print("-" * 30)
+def search_ingredient(data, ingredient_index):
+    """Search for recipes by ingredient, using the ingredient index"""
+    # Offer the most used ingredients starting with what the user types,
+    # instead of listing every ingredient
+    completions = PrefixIndex(usage_counts(ingredient_index))
+    ingredient_searched = choose(completions)
     
-    try:
-        # Ask user to pick a number
-        choice = int(input("\nEnter the number of the ingredient you want to search for: "))
-        # Use that number to grab the ingredient from the list
-        ingredient_searched = all_ingredients[choice]
-        
-    except ValueError:
-        # In case they typed text instead of a number
-        print("Error: Please enter a valid number.")
-        return  # Exit the function early
-        
-    except IndexError:
-        # In case they typed a number that's too big (like 99 when there's only 10 items)
-        print("Error: That number is not in the list.")
-        return  # Exit the function early
-        
-    except:
-        # Something else (strange) happened
-        print("An unexpected error occurred.")
-        return  # Yes, this exits the function early
+    if ingredient_searched is None:
+        print("No ingredient chosen.")
         
     else:
         # Everything worked, now find recipes with a certain ingredient from input
@@ -52,28 +39,142 @@ def search_ingredient(data):
         
         found_recipes = False
         
-        # Loop through every recipe in the known data
-        for recipe in data['recipes_list']:
-            # Check if the ingredient we're looking for is in this particular recipe
-            if ingredient_searched in recipe['ingredients']:
-                # Show this recipe
-                display_recipe(recipe)  
-                found_recipes = True  
+        # The index already knows which recipes use this ingredient,
+        # so only those recipes are visited
+        for position in find_positions(ingredient_index, ingredient_searched):
+            display_recipe(data['recipes_list'][position])
+            found_recipes = True
         
         # If no recipes found with this ingredient
         if not found_recipes:
             print(f"No recipes found with {ingredient_searched}.")
 
 
+def search_pantry(data, filename, ingredient_index):
+    """Find the recipes that only use ingredients the user has"""
+    try:
+        # Bitmaps over the recipes, one per ingredient, saved next to the
+        # file (needs NumPy)
+        pantry_index = get_pantry_index(filename, ingredient_index)
+    except ImportError:
+        print("Searching by pantry needs NumPy: pip install numpy")
+        return
+    
+    # Pick the ingredients one at a time until the user presses Enter
+    completions = PrefixIndex(usage_counts(ingredient_index))
+    pantry = []
+    while True:
+        ingredient = choose(completions)
+        if ingredient is None:
+            break
+        if ingredient not in pantry:
+            pantry.append(ingredient)
+        print(f"In your pantry: {', '.join(pantry)}")
+    if not pantry:
+        print("No ingredients chosen.")
+        return
+    
+    ingredient_ids = ingredient_index['dictionary'].encode(pantry, add=False)
+    positions = pantry_index.only(ingredient_ids).to_array().tolist()
+    
+    print(f"\nRecipes you can cook with {', '.join(pantry)}:")
+    print("=" * 50)
+    for position in positions:
+        display_recipe(data['recipes_list'][position])
+    if not positions:
+        print("No recipe uses only these ingredients.")
+
+
+def get_text_index(filename, recipes_list):
+    """Load the full-text index of a recipe file, bringing it up to date"""
+    text_index_filename = filename + '.fts'
+    text_index = TextIndex.load(text_index_filename)
+    if text_index is None or text_index.info.get('recipe_count', 0) > len(recipes_list):
+        text_index = TextIndex()
+    start = text_index.info.get('recipe_count', 0)
+    if start < len(recipes_list):
+        # Recipes are only ever appended: index the new ones, by position
+        for position in range(start, len(recipes_list)):
+            recipe = recipes_list[position]
+            text_index.add(position, recipe['name'], recipe['ingredients'])
+        text_index.info['recipe_count'] = len(recipes_list)
+        try:
+            text_index.save(text_index_filename)
+        except OSError:
+            # Read-only location: the index still works for this run
+            pass
+    return text_index
+
+
+def search_text(data, filename, ingredient_index):
+    """Search recipe names and ingredients for some words, best matches first"""
+    query = input("\nEnter words to search for: ")
+    text_index = get_text_index(filename, data['recipes_list'])
+    
+    results = text_index.search(query, k=10)
+    if not results:
+        print(f"No recipes found for '{query}'.")
+        # Maybe a typo: offer the ingredients spelt like it
+        suggestions = PrefixIndex(usage_counts(ingredient_index)).similar(query, 3)
+        if suggestions:
+            print("Did you mean: " + ", ".join(name for name, _ in suggestions) + "?")
+        return
+    
+    print(f"\nBest matches for '{query}':")
+    for position, score in results:
+        display_recipe(data['recipes_list'][position])
+        print(f"(score {score:.2f})")
+
+
+def search_similar(data, filename):
+    """Find a recipe by name, then the recipes most like it"""
+    try:
+        similarity_index = get_similarity_index(filename, data['recipes_list'])
+    except ImportError:
+        print("Finding similar recipes needs NumPy: pip install numpy")
+        return
+    
+    query = input("\nEnter words from the recipe's name: ")
+    results = get_text_index(filename, data['recipes_list']).search(query, k=5)
+    if not results:
+        print(f"No recipes found for '{query}'.")
+        return
+    for number, (position, _) in enumerate(results, 1):
+        print(f"{number}. {data['recipes_list'][position]['name']}")
+    try:
+        position = results[int(input("Which one (number)? ")) - 1][0]
+    except (ValueError, IndexError):
+        print("That is not one of the numbers above.")
+        return
+    
+    recipe = data['recipes_list'][position]
+    similar = similarity_index.similar(recipe['name'], recipe['ingredients'], exclude=position)
+    if not similar:
+        print(f"No recipes are much like {recipe['name']}.")
+        return
+    print(f"\nRecipes most like {recipe['name']}:")
+    for similar_position, similarity in similar:
+        display_recipe(data['recipes_list'][similar_position])
+        print(f"({similarity:.0%} alike)")
+
+
 # Main code starts here
 filename = input("Enter the filename where your recipes are stored: ")
 
+store = RecipeStore(filename)
+
 try:
-    # Try to open the file and load the pickled data
-    # 'rb' = read binary
-    file = open(filename, 'rb')
-    # Turn the pickle back into a dictionary  
-    data = pickle.load(file)  
+    if not store.exists():
+        raise FileNotFoundError(filename)
+    if os.path.exists(columnar_filename(filename)):
+        # Map the columnar copy into memory: recipes are decoded only when shown
+        data, ingredient_index = open_columnar(store)
+    else:
+        # Stream recipes from the store, decoding them only when shown
+        reader = RecipeReader(store)
+        data = {'recipes_list': reader, 'all_ingredients': reader.all_ingredients}
+        # Load (or build) the ingredient index stored next to the file
+        ingredient_index = get_index(filename, data['recipes_list'])
     
 except FileNotFoundError:
     # File doesn't exist
@@ -85,6 +186,17 @@ except:
     
 else:
     # File loaded successfully! Now let's search
-    file.close()
-    # Call our search function  
-    search_ingredient(data)
\ No newline at end of file
+    print("\n1. Pick an ingredient from the list")
+    print("2. Search names and ingredients for words")
+    print("3. Find what you can cook with the ingredients you have")
+    print("4. Find recipes similar to one")
+    search_by = input("Search by (1-4, default 1): ").strip()
+    if search_by == "2":
+        search_text(data, filename, ingredient_index)
+    elif search_by == "3":
+        search_pantry(data, filename, ingredient_index)
+    elif search_by == "4":
+        search_similar(data, filename)
+    else:
+        # Call our search function  
+        search_ingredient(data, ingredient_index)
\ No newline at end of file
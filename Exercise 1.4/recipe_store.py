@@ -0,0 +1,355 @@
+import os
+import sys
+import glob
+import pickle
+import struct
+import threading
+from contextlib import contextmanager
+from bisect import bisect_right
+from array import array
+from recipe_index import new_index, add_to_index, save_index, save_pantry_index
+from recipe_columnar import write_columnar, columnar_filename
+
+try:
+    import fcntl
+except ImportError:
+    # No file locks (Windows): compact from one process at a time
+    fcntl = None
+
+# The ingredient dictionary is shared by every exercise: recipe_dictionary.py
+# lives at the top of the repository
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from recipe_dictionary import unique_names
+
+# Append-only, log-structured recipe store.
+#
+# A store called 'recipes.bin' is made of:
+#   recipes.bin             the base file, holding every compacted recipe
+#   recipes.bin.seg.000001  log segments, holding recipes appended since then
+#
+# Each batch of new recipes is written to a new segment as framed records (a
+# 4-byte length followed by the pickled recipe), so saving costs as much as the
+# batch being saved. A segment is written under a temporary name and only
+# gets its number once it is on disk, so any segment listed is complete.
+# Compaction folds the segments back into the base file, and
+# readers always see a consistent snapshot of base + segments.
+# Compaction also writes a columnar copy ('recipes.bin.col', see
+# recipe_columnar.py) that searches can map into memory instead of loading,
+# the ingredient index ('recipes.bin.idx') and its pantry bitmaps
+# ('recipes.bin.pantry', see recipe_bitmap.py).
+# An old single-pickle 'recipes.bin' is still read as a base file.
+
+MAGIC = b'RSTORE01'
+FRAME_HEADER = struct.Struct('>I')
+SEGMENT_SUFFIX = '.seg.'
+COMPACT_AFTER_SEGMENTS = 8
+
+
+def write_frame(file, obj):
+    """Write one framed record to an open binary file"""
+    payload = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    file.write(FRAME_HEADER.pack(len(payload)) + payload)
+
+
+def read_frames(file, end):
+    """Yield the records of an open binary file up to byte 'end'"""
+    while file.tell() + FRAME_HEADER.size <= end:
+        (length,) = FRAME_HEADER.unpack(file.read(FRAME_HEADER.size))
+        if file.tell() + length > end:
+            # Torn record from a write still in progress: not part of the snapshot
+            return
+        yield pickle.loads(file.read(length))
+
+
+def file_identity(stat):
+    # Changes when a file is replaced or rewritten
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+@contextmanager
+def file_lock(filename):
+    # Exclusive lock shared by every process using the store
+    with open(filename, 'a') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class RecipeStore:
+    def __init__(self, filename):
+        self.filename = filename
+        self.compaction = None
+
+    def exists(self):
+        # True when there is a base file or any segment
+        return os.path.exists(self.filename) or bool(self.segment_numbers())
+
+    def segment_name(self, number):
+        return f"{self.filename}{SEGMENT_SUFFIX}{number:06d}"
+
+    def segment_numbers(self):
+        # Numbers of the segments on disk, oldest first
+        numbers = []
+        for name in glob.glob(glob.escape(self.filename) + SEGMENT_SUFFIX + '*'):
+            suffix = name[len(self.filename) + len(SEGMENT_SUFFIX):]
+            if suffix.isdigit():
+                numbers.append(int(suffix))
+        return sorted(numbers)
+
+    def segment_count(self):
+        return len(self.segment_numbers())
+
+    def read_segment(self, number, end=None):
+        """Return the recipes of a segment, up to byte 'end' if given"""
+        with open(self.segment_name(number), 'rb') as file:
+            if end is None:
+                end = os.fstat(file.fileno()).st_size
+            file.seek(len(MAGIC))
+            return list(read_frames(file, end))
+
+    def read_tail(self, after_segment, still_valid):
+        """Return the recipes of the segments newer than 'after_segment'
+
+        'still_valid' is called once the segments are listed; if it returns
+        False a compaction got in the way and FileNotFoundError is raised.
+        """
+        sizes = []
+        for number in self.segment_numbers():
+            if number > after_segment:
+                sizes.append((number, os.path.getsize(self.segment_name(number))))
+        if not still_valid():
+            raise FileNotFoundError(self.filename)
+        recipes = []
+        for number, size in sizes:
+            recipes.extend(self.read_segment(number, size))
+        return recipes
+
+    def append(self, recipes):
+        """Append a batch of recipes as a new segment and flush it to disk
+
+        Each batch gets its own segment, so compaction can tell from the
+        segment count when enough has piled up.
+        """
+        temp_name = f"{self.filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_name, 'wb') as file:
+            file.write(MAGIC)
+            for recipe in recipes:
+                write_frame(file, recipe)
+            file.flush()
+            os.fsync(file.fileno())
+
+        numbers = self.segment_numbers()
+        # Never reuse a number already folded into the base file
+        number = max(numbers[-1] if numbers else 0, self.read_merged_segments()) + 1
+        while True:
+            try:
+                # Unlike a rename, a link fails if another process took this
+                # number first
+                os.link(temp_name, self.segment_name(number))
+            except FileExistsError:
+                number += 1
+            else:
+                break
+        os.remove(temp_name)
+
+    def read_merged_segments(self):
+        # Last segment number folded into the base file
+        try:
+            with open(self.filename, 'rb') as file:
+                if file.read(len(MAGIC)) != MAGIC:
+                    return 0
+                return next(read_frames(file, os.fstat(file.fileno()).st_size))['merged_segments']
+        except FileNotFoundError:
+            return 0
+
+    def compact(self):
+        """Fold every sealed segment into a new base file"""
+        # One compaction at a time, whichever process starts it
+        with file_lock(self.filename + '.lock'):
+            self.compact_segments()
+
+    def compact_segments(self):
+        numbers = self.segment_numbers()
+        if not numbers:
+            return
+        # Appends made from now on go to newer segments, which are left alone
+        sealed = numbers[-1]
+
+        reader = RecipeReader(self, upto=sealed)
+        header = {
+            'merged_segments': sealed,
+            'recipe_count': len(reader),
+            'all_ingredients': reader.all_ingredients
+        }
+        index = new_index()
+
+        def recipes_being_indexed():
+            # Index every recipe while it streams into the columnar copy
+            for position, recipe in enumerate(reader):
+                add_to_index(index, (recipe,), position)
+                yield recipe
+
+        # The columnar copy goes in first: its readers ignore the segments
+        # it already holds, so they can be removed once the base is replaced
+        write_columnar(columnar_filename(self.filename), recipes_being_indexed(), sealed)
+
+        temp_name = self.filename + '.tmp'
+        with open(temp_name, 'wb') as file:
+            file.write(MAGIC)
+            write_frame(file, header)
+            # Records are copied as they are, without unpickling them
+            for position in range(len(reader)):
+                file.write(reader.frame(position))
+            file.flush()
+            os.fsync(file.fileno())
+        reader.close()
+        # Readers see either the old base + segments or the new base
+        os.replace(temp_name, self.filename)
+        for number in numbers:
+            os.remove(self.segment_name(number))
+
+        # The index (and its pantry bitmaps) are replaced together with the
+        # base file
+        save_index(index, self.filename)
+        save_pantry_index(index, self.filename)
+
+    def compact_in_background(self):
+        """Run compaction on a background thread, unless one is running"""
+        if self.compaction is None or not self.compaction.is_alive():
+            self.compaction = threading.Thread(target=self.compact)
+            self.compaction.start()
+        return self.compaction
+
+
+class RecipeReader:
+    """Read-only view of a store that unpickles one recipe at a time
+
+    Only a table with the file offset of every recipe (8 bytes each) is kept
+    in memory; a recipe is read and decoded when it is asked for, so the
+    store can be much larger than RAM. The view is a consistent snapshot
+    taken when the reader is created.
+    """
+
+    def __init__(self, store, upto=None):
+        self.store = store
+        while True:
+            self.sources = []
+            self.starts = []
+            self.offsets = array('Q')
+            try:
+                self.open_sources(upto)
+            except FileNotFoundError:
+                # A compaction replaced the base or removed a segment we were
+                # about to open: retry
+                self.close()
+                continue
+            break
+
+        # Ingredients of the base file are listed in its header; the ones
+        # added since then come from the (small) segments. Each is listed
+        # once, whatever its case or spacing
+        all_ingredients = list(self.header['all_ingredients'])
+        for position in range(self.base_count, len(self)):
+            all_ingredients += self[position]['ingredients']
+        self.all_ingredients = unique_names(all_ingredients)
+
+    def open_sources(self, upto):
+        self.header = {'merged_segments': 0, 'all_ingredients': []}
+        try:
+            base = open(self.store.filename, 'rb')
+        except FileNotFoundError:
+            base = None
+        base_identity = None if base is None else file_identity(os.fstat(base.fileno()))
+        if base is not None:
+            if base.read(len(MAGIC)) == MAGIC:
+                end = os.fstat(base.fileno()).st_size
+                self.header = next(read_frames(base, end))
+                self.add_source(base, end)
+            else:
+                # Old format: one pickled dictionary, which has to be loaded whole
+                base.seek(0)
+                data = pickle.load(base)
+                base.close()
+                self.header['all_ingredients'] = data['all_ingredients']
+                self.starts.append(len(self.offsets))
+                self.sources.append(data['recipes_list'])
+                self.offsets.extend(range(len(data['recipes_list'])))
+        self.base_count = len(self.offsets)
+
+        for number in self.store.segment_numbers():
+            if number > self.header['merged_segments'] and (upto is None or number <= upto):
+                segment = open(self.store.segment_name(number), 'rb')
+                end = os.fstat(segment.fileno()).st_size
+                segment.seek(len(MAGIC))
+                self.add_source(segment, end)
+
+        # A compaction finishing while the segments were listed replaces the
+        # base and removes the segments it merged: this base would then miss
+        # them, so start again (the caller retries on FileNotFoundError)
+        try:
+            current_identity = file_identity(os.stat(self.store.filename))
+        except FileNotFoundError:
+            current_identity = None
+        if current_identity != base_identity:
+            raise FileNotFoundError(self.store.filename)
+
+    def add_source(self, file, end):
+        # Record where every complete record of an open file starts,
+        # reading only the length prefixes
+        self.starts.append(len(self.offsets))
+        self.sources.append(file)
+        offset = file.tell()
+        while offset + FRAME_HEADER.size <= end:
+            file.seek(offset)
+            (length,) = FRAME_HEADER.unpack(file.read(FRAME_HEADER.size))
+            if offset + FRAME_HEADER.size + length > end:
+                # Torn record from a write still in progress
+                break
+            self.offsets.append(offset)
+            offset += FRAME_HEADER.size + length
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def payload(self, position):
+        # Pickled bytes of a recipe, or the recipe itself for the old format
+        source = self.sources[bisect_right(self.starts, position) - 1]
+        if isinstance(source, list):
+            return source[self.offsets[position]]
+        source.seek(self.offsets[position])
+        (length,) = FRAME_HEADER.unpack(source.read(FRAME_HEADER.size))
+        return source.read(length)
+
+    def frame(self, position):
+        """Return a recipe as a framed record, ready to be written elsewhere"""
+        payload = self.payload(position)
+        if not isinstance(payload, bytes):
+            payload = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+        return FRAME_HEADER.pack(len(payload)) + payload
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            # Slices are lazy as well
+            return (self[i] for i in range(*position.indices(len(self))))
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        payload = self.payload(position)
+        if isinstance(payload, bytes):
+            return pickle.loads(payload)
+        return payload
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    def close(self):
+        for source in self.sources:
+            if not isinstance(source, list):
+                source.close()
+        self.sources = []
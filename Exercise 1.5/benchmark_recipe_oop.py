@@ -0,0 +1,69 @@
+import sys
+import time
+import random
+import tracemalloc
+from recipe_oop import Recipe, RecipeCatalog, IngredientList
+from recipe_dictionary import IngredientDictionary
+
+# Benchmark: build a large catalog of recipe objects, timing it and
+# measuring how much memory each recipe takes. The two are separate builds:
+# tracemalloc slows every allocation down several times, so a build it
+# watches says nothing about speed.
+# Usage: python benchmark_recipe_oop.py [number_of_recipes] [distinct_ingredients] [--compact]
+
+
+def reset_ingredients():
+    # Start from an empty ingredient dictionary, so every build registers
+    # (and pays for) the whole vocabulary
+    Recipe.dictionary = IngredientDictionary()
+    Recipe.all_ingredients = IngredientList(Recipe.dictionary)
+
+
+def make_catalog(recipe_count, vocabulary_size, compact=False, seed=42):
+    """Build 'recipe_count' recipes drawing from 'vocabulary_size' ingredients
+
+    Returns a list of Recipe objects, or a RecipeCatalog if 'compact'.
+    """
+    random_numbers = random.Random(seed)
+    vocabulary = [f"Ingredient {i}" for i in range(vocabulary_size)]
+    recipes = RecipeCatalog() if compact else []
+    for i in range(recipe_count):
+        # Fresh string copies, like ingredients typed in or parsed from a file
+        ingredients = random_numbers.sample(vocabulary, random_numbers.randint(2, 10))
+        ingredients = [ingredient.encode().decode() for ingredient in ingredients]
+        cooking_time = random_numbers.randint(1, 120)
+        if compact:
+            recipes.add_recipe(f"Recipe {i}", ingredients, cooking_time)
+        else:
+            recipe = Recipe(f"Recipe {i}")
+            recipe.add_ingredients(*ingredients)
+            recipe.set_cooking_time(cooking_time)
+            recipes.append(recipe)
+    return recipes
+
+
+if __name__ == "__main__":
+    arguments = [argument for argument in sys.argv[1:] if not argument.startswith('--')]
+    recipe_count = int(arguments[0]) if len(arguments) > 0 else 1_000_000
+    vocabulary_size = int(arguments[1]) if len(arguments) > 1 else 50_000
+    compact = '--compact' in sys.argv
+
+    what = "recipes in a RecipeCatalog" if compact else "Recipe objects"
+    print(f"Building {recipe_count:,} {what} over {vocabulary_size:,} ingredients...")
+    reset_ingredients()
+    started = time.perf_counter()
+    recipes = make_catalog(recipe_count, vocabulary_size, compact)
+    elapsed = time.perf_counter() - started
+    registered = len(Recipe.dictionary)
+    del recipes
+
+    # Same catalog again, this time with every allocation traced
+    reset_ingredients()
+    tracemalloc.start()
+    recipes = make_catalog(recipe_count, vocabulary_size, compact)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"Built in {elapsed:.2f} s ({recipe_count / elapsed:,.0f} recipes/s)")
+    print(f"Registered ingredients: {registered:,}")
+    print(f"Memory: {memory / 2**20:,.1f} MiB ({memory / recipe_count:,.0f} bytes per recipe)")
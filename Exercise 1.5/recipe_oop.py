@@ -1,6 +1,53 @@
+import os
+import sys
+from array import array
+from collections.abc import Sequence
+
+# The difficulty rules and the ingredient dictionary are shared by every
+# exercise: they live at the top of the repository
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from recipe_difficulty import calculate_difficulty
+from recipe_dictionary import IngredientDictionary
+
+class IngredientList(Sequence):
+    # The names of an IngredientDictionary as a list, in first-seen order:
+    # indexing, len(), iteration and append() work like on the old list, but
+    # 'in' and index() are dictionary lookups instead of scans, and it
+    # follows the dictionary as ingredients are registered
+    def __init__(self, dictionary):
+        self.dictionary = dictionary
+
+    def __getitem__(self, position):
+        return self.dictionary.names[position]
+
+    def __len__(self):
+        return len(self.dictionary)
+
+    def __iter__(self):
+        return iter(self.dictionary.names)
+
+    def __contains__(self, name):
+        return self.dictionary.get(name) is not None
+
+    def index(self, name):
+        # Position of an ingredient, which is also its id
+        ingredient_id = self.dictionary.get(name)
+        if ingredient_id is None:
+            raise ValueError(f"{name!r} is not in the list")
+        return ingredient_id
+
+    def append(self, name):
+        # Registers the ingredient (once, however it is spelt)
+        self.dictionary.add(name)
+
+
 class Recipe:
-    # Class variable to track ALL ingredients across ALL recipes
-    all_ingredients = []
+    # Class variable to track ALL ingredients across ALL recipes.
+    # Every ingredient gets an id, and spellings differing only in case or
+    # spacing ("Olive oil", "olive  oil") are the same ingredient
+    dictionary = IngredientDictionary()
+    # The same ingredients as a list of names
+    all_ingredients = IngredientList(dictionary)
     
     def __init__(self, name):
         #Initialize new recipe with a name
@@ -26,31 +73,33 @@ class Recipe:
         self.cooking_time = cooking_time
 
     def add_ingredients(self, *ingredients):
-        #Add multiple ingredients
+        #Add multiple ingredients, each once, spelt the way it was first
+        #registered
         for ingredient in ingredients:
-            self.ingredients.append(ingredient)
-        self.update_all_ingredients()
+            name = Recipe.dictionary.name(Recipe.register_ingredient(ingredient))
+            if name not in self.ingredients:
+                self.ingredients.append(name)
     
     def get_ingredients(self):
         # Return list of ingredients
         return self.ingredients
     
-    def update_all_ingredients(self):
-        # Add this recipe's ingredients to the class-wide ingredient list
-        for ingredient in self.ingredients:
-            if ingredient not in Recipe.all_ingredients:
-                Recipe.all_ingredients.append(ingredient)
+    def update_all_ingredients(self, ingredients=None):
+        # Add this recipe's ingredients (or just the given ones) to the
+        # class-wide ingredient registry, keeping first-seen order
+        if ingredients is None:
+            ingredients = self.ingredients
+        for ingredient in ingredients:
+            Recipe.register_ingredient(ingredient)
+
+    @staticmethod
+    def register_ingredient(ingredient):
+        # Return the id of an ingredient, registering it the first time
+        return Recipe.dictionary.add(ingredient)
     
     def calculate_difficulty(self):
         # Calculate recipe difficulty upon cooking time and ingredients
-        if self.cooking_time < 10 and len(self.ingredients) < 4:
-            self.difficulty = "Easy"
-        elif self.cooking_time < 10 and len(self.ingredients) >= 4:
-            self.difficulty = "Medium"
-        elif self.cooking_time >= 10 and len(self.ingredients) < 4:
-            self.difficulty = "Intermediate"
-        else:
-            self.difficulty = "Hard"
+        self.difficulty = calculate_difficulty(self.cooking_time, len(self.ingredients))
     
     def get_difficulty(self):
         # Show difficulty, calculating it if needed
@@ -59,8 +108,8 @@ class Recipe:
         return self.difficulty
 
     def search_ingredient(self, ingredient):
-        #Search for ingredient in recipe
-        return ingredient in self.ingredients
+        #Search for ingredient in recipe, however it is spelt
+        return Recipe.dictionary.canonical_name(ingredient) in self.ingredients
     
     def __str__(self):
         # Return a formatted string of recipe
@@ -75,6 +124,110 @@ class Recipe:
         output += f"{'='*50}"
         return output
     
+
+class RecipeCatalog:
+    # Memory-saving store for large catalogs. Instead of one object per
+    # recipe, every recipe is packed into a few flat arrays shared by the
+    # whole catalog:
+    #   names            the recipe names as UTF-8 bytes, back to back
+    #   ingredient_ids   4-byte ids into the shared Recipe.dictionary, recipe
+    #                    after recipe (each ingredient string exists once)
+    #   name_ends, ingredient_ends
+    #                    where each recipe's part of those two ends
+    #   cooking_times    2 bytes per recipe (up to 65535 minutes)
+    # Difficulty is worked out when asked for. Recipes are handed out as
+    # CompactRecipe views, made on demand, so a recipe costs its name's bytes
+    # plus 4 bytes per ingredient and 10 bytes more: about 5 times less than
+    # a Recipe object (see benchmark_recipe_oop.py). Names and ingredients
+    # are fixed once a recipe is added.
+
+    def __init__(self):
+        self.names = bytearray()
+        self.name_ends = array('I')
+        self.ingredient_ids = array('I')
+        self.ingredient_ends = array('I')
+        self.cooking_times = array('H')
+
+    def __len__(self):
+        return len(self.cooking_times)
+
+    def add_recipe(self, name, ingredients, cooking_time=0):
+        # Add a recipe, registering new ingredients on the way, each once and
+        # in the order given, and return it
+        ingredient_ids = []
+        for ingredient in ingredients:
+            ingredient_id = Recipe.register_ingredient(ingredient)
+            if ingredient_id not in ingredient_ids:
+                ingredient_ids.append(ingredient_id)
+        self.names += name.encode('utf-8')
+        self.name_ends.append(len(self.names))
+        self.ingredient_ids.extend(ingredient_ids)
+        self.ingredient_ends.append(len(self.ingredient_ids))
+        self.cooking_times.append(cooking_time)
+        return CompactRecipe(self, len(self) - 1)
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        return CompactRecipe(self, position)
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield CompactRecipe(self, position)
+
+
+class CompactRecipe:
+    # One recipe of a RecipeCatalog: only the catalog and the position, with
+    # the same methods as Recipe reading the catalog's arrays
+    __slots__ = ('catalog', 'position')
+
+    def __init__(self, catalog, position):
+        self.catalog = catalog
+        self.position = position
+
+    def part(self, ends, values):
+        # This recipe's slice of one of the catalog's packed arrays
+        start = ends[self.position - 1] if self.position else 0
+        return values[start:ends[self.position]]
+
+    @property
+    def name(self):
+        return self.part(self.catalog.name_ends, self.catalog.names).decode('utf-8')
+
+    @property
+    def ingredient_ids(self):
+        return self.part(self.catalog.ingredient_ends, self.catalog.ingredient_ids)
+
+    @property
+    def ingredients(self):
+        # Ingredient names, rebuilt from their ids
+        return Recipe.dictionary.decode(self.ingredient_ids)
+
+    @property
+    def cooking_time(self):
+        return self.catalog.cooking_times[self.position]
+
+    def set_cooking_time(self, cooking_time):
+        self.catalog.cooking_times[self.position] = cooking_time
+
+    def calculate_difficulty(self):
+        return calculate_difficulty(self.cooking_time, len(self.ingredient_ids))
+
+    def search_ingredient(self, ingredient):
+        # Compare ids instead of strings (a recipe only has a handful)
+        ingredient_id = Recipe.dictionary.get(ingredient)
+        return ingredient_id is not None and ingredient_id in self.ingredient_ids
+
+    # Everything else works the same as in Recipe
+    get_name = Recipe.get_name
+    get_cooking_time = Recipe.get_cooking_time
+    get_ingredients = Recipe.get_ingredients
+    get_difficulty = calculate_difficulty
+    __str__ = Recipe.__str__
+
+
 def recipe_search(data, search_term):
     # Search for recipes containing particular (specific) ingredient
     print(f"\nRecipes containing '{search_term}':")
@@ -85,46 +238,47 @@ def recipe_search(data, search_term):
             print(recipe)
 
 # Main code starts here
-print("\n" + "="*50)
-print("Creating Recipe Objects")
-print("="*50)
-
-# Create Tea recipe
-tea = Recipe("Tea")
-tea.add_ingredients("Tea Leaves", "Water")
-tea.set_cooking_time(5)
-print(tea)
-
-# Create Coffee recipe
-coffee = Recipe("Coffee")
-coffee.add_ingredients("Coffee Powder", "Sugar", "Water")
-coffee.set_cooking_time(5)
-print(coffee)
-
-# Create Cake recipe
-cake = Recipe("Cake")
-cake.add_ingredients("Sugar", "Butter", "Eggs", "Vanilla Essence", "Flour", "Baking Powder", "Milk")
-cake.set_cooking_time(50)
-print(cake)
-
-# Create Banana Smoothie recipe
-banana_smoothie = Recipe("Banana Smoothie")
-banana_smoothie.add_ingredients("Bananas", "Milk", "Peanut Butter", "Sugar", "Ice Cubes")
-banana_smoothie.set_cooking_time(5)
-print(banana_smoothie)
-
-# Bundle all recipes into a list
-recipes_list = [tea, coffee, cake, banana_smoothie]
-
-print("\n" + "="*50)
-print("Searching for recipes by ingredient")
-print("="*50)
-
-# Search for recipes containing Water
-recipe_search(recipes_list, "Water")
-
-# Search for recipes containing Sugar
-recipe_search(recipes_list, "Sugar")
-
-# Search for recipes containing Bananas
-recipe_search(recipes_list, "Bananas")
+if __name__ == "__main__":
+    print("\n" + "="*50)
+    print("Creating Recipe Objects")
+    print("="*50)
+
+    # Create Tea recipe
+    tea = Recipe("Tea")
+    tea.add_ingredients("Tea Leaves", "Water")
+    tea.set_cooking_time(5)
+    print(tea)
+
+    # Create Coffee recipe
+    coffee = Recipe("Coffee")
+    coffee.add_ingredients("Coffee Powder", "Sugar", "Water")
+    coffee.set_cooking_time(5)
+    print(coffee)
+
+    # Create Cake recipe
+    cake = Recipe("Cake")
+    cake.add_ingredients("Sugar", "Butter", "Eggs", "Vanilla Essence", "Flour", "Baking Powder", "Milk")
+    cake.set_cooking_time(50)
+    print(cake)
+
+    # Create Banana Smoothie recipe
+    banana_smoothie = Recipe("Banana Smoothie")
+    banana_smoothie.add_ingredients("Bananas", "Milk", "Peanut Butter", "Sugar", "Ice Cubes")
+    banana_smoothie.set_cooking_time(5)
+    print(banana_smoothie)
+
+    # Bundle all recipes into a list
+    recipes_list = [tea, coffee, cake, banana_smoothie]
+
+    print("\n" + "="*50)
+    print("Searching for recipes by ingredient")
+    print("="*50)
+
+    # Search for recipes containing Water
+    recipe_search(recipes_list, "Water")
+
+    # Search for recipes containing Sugar
+    recipe_search(recipes_list, "Sugar")
+
+    # Search for recipes containing Bananas
+    recipe_search(recipes_list, "Bananas")
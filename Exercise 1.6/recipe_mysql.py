@@ -1,104 +1,414 @@
+import os
+import sys
+import time
 import mysql.connector
+from recipe_pool import RecipePool
 
-# Connect to MySQL
-conn = mysql.connector.connect(
-    host='localhost',
-    user='cf-python',
-    passwd='password'
-)
+# The difficulty rules, typeahead and ingredient spelling rules are shared by
+# every exercise: they live at the top of the repository
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import recipe_difficulty
+from recipe_autocomplete import PrefixIndex, choose
+from recipe_dictionary import ingredient_key, unique_names
 
-cursor = conn.cursor()
+# MySQL settings
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'cf-python',
+    'passwd': 'password'
+}
+DATABASE = 'task_database'
+POOL_SIZE = 5
+BATCH_SIZE = 1000
 
-# Create and use database
-cursor.execute("CREATE DATABASE IF NOT EXISTS task_database")
-cursor.execute("USE task_database")
+# Prefix index over the ingredient names, loaded on the first search and
+# dropped whenever this program changes a recipe's ingredients. Changes made
+# by other programs show up after a restart.
+ingredient_completions = None
 
-# Create Recipes table
-cursor.execute('''CREATE TABLE IF NOT EXISTS Recipes (
-    id INT AUTO_INCREMENT PRIMARY KEY,
-    name VARCHAR(50),
-    ingredients VARCHAR(255),
-    cooking_time INT,
-    difficulty VARCHAR(20)
-)''')
+# Function to create the database and its table
+def setup_database():
+    # A one-off connection, since the pool connects straight to the database
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+
+    # Create and use database
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DATABASE}")
+    cursor.execute(f"USE {DATABASE}")
+
+    # Create Recipes table
+    cursor.execute('''CREATE TABLE IF NOT EXISTS Recipes (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(50),
+        ingredients VARCHAR(255),
+        cooking_time INT,
+        difficulty VARCHAR(20)
+    )''')
+
+    # Every distinct ingredient once. Binary collation: "Salt" only matches "Salt".
+    # usage_count is the number of recipes using it, so the ingredient menu
+    # is one indexed query, most popular first
+    cursor.execute('''CREATE TABLE IF NOT EXISTS ingredients (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(255) COLLATE utf8mb4_bin NOT NULL,
+        usage_count INT NOT NULL DEFAULT 0,
+        UNIQUE KEY ingredient_name (name),
+        KEY ingredient_popularity (usage_count DESC, name)
+    )''')
+
+    # Tables created before usage counts existed get the column here; the
+    # counts themselves are filled in by migrate_ingredients()
+    cursor.execute("SHOW COLUMNS FROM ingredients LIKE 'usage_count'")
+    if not cursor.fetchall():
+        cursor.execute('''ALTER TABLE ingredients
+            ADD COLUMN usage_count INT NOT NULL DEFAULT 0,
+            ADD KEY ingredient_popularity (usage_count DESC, name)''')
+
+    # Which recipe uses which ingredient. The primary key finds the recipes
+    # of an ingredient, the second index the ingredients of a recipe.
+    # Recipes.ingredients is kept as the text shown to the user.
+    cursor.execute('''CREATE TABLE IF NOT EXISTS recipe_ingredients (
+        recipe_id INT NOT NULL,
+        ingredient_id INT NOT NULL,
+        PRIMARY KEY (ingredient_id, recipe_id),
+        KEY recipe_ingredient (recipe_id, ingredient_id),
+        FOREIGN KEY (recipe_id) REFERENCES Recipes(id) ON DELETE CASCADE,
+        FOREIGN KEY (ingredient_id) REFERENCES ingredients(id)
+    )''')
+
+    # Data migrations already applied
+    cursor.execute('''CREATE TABLE IF NOT EXISTS migrations (
+        name VARCHAR(50) PRIMARY KEY
+    )''')
+    conn.commit()
+
+    cursor.close()
+    conn.close()
+
+# Function to open the connection pool
+def create_pool(size=POOL_SIZE):
+    return RecipePool(size=size, database=DATABASE, **DB_CONFIG)
 
 # Function to calculate difficulty
 def calculate_difficulty(cooking_time, ingredients):
-    num_ingredients = len(ingredients)
-    
-    if cooking_time < 10 and num_ingredients < 4:
-        return "Easy"
-    elif cooking_time < 10 and num_ingredients >= 4:
-        return "Medium"
-    elif cooking_time >= 10 and num_ingredients < 4:
-        return "Intermediate"
-    else:
-        return "Hard"
+    return recipe_difficulty.calculate_difficulty(cooking_time, len(ingredients))
+
+# Functions keeping the ingredient tables in step with Recipes. They run on
+# the caller's cursor, inside the caller's transaction.
+
+def get_ingredients(cursor, names):
+    # Return {ingredient key: (id, stored name)}, adding the ingredients that
+    # are not there yet. A name differing from a stored one only in case or
+    # spacing ("salt", "Salt") gets the stored ingredient.
+    names = unique_names(names)
+    found = {}
+    missing = names
+    if missing:
+        placeholders = ", ".join(["%s"] * len(missing))
+        cursor.execute(f"SELECT id, name FROM ingredients WHERE name IN ({placeholders})", missing)
+        for ingredient_id, name in cursor.fetchall():
+            found[ingredient_key(name)] = (ingredient_id, name)
+        missing = [name for name in missing if ingredient_key(name) not in found]
+    if missing:
+        # Not stored with this exact spelling. LOWER() can't use the index,
+        # but this only happens for names that are new or spelt differently
+        placeholders = ", ".join(["%s"] * len(missing))
+        cursor.execute(f"SELECT id, name FROM ingredients WHERE LOWER(name) IN ({placeholders}) ORDER BY id",
+                       [name.lower() for name in missing])
+        for ingredient_id, name in cursor.fetchall():
+            found.setdefault(ingredient_key(name), (ingredient_id, name))
+        missing = [name for name in missing if ingredient_key(name) not in found]
+    if missing:
+        cursor.executemany("INSERT IGNORE INTO ingredients (name) VALUES (%s)", [(name,) for name in missing])
+        placeholders = ", ".join(["%s"] * len(missing))
+        cursor.execute(f"SELECT id, name FROM ingredients WHERE name IN ({placeholders})", missing)
+        for ingredient_id, name in cursor.fetchall():
+            found[ingredient_key(name)] = (ingredient_id, name)
+    return found
+
+def stored_spellings(cursor, names):
+    # The names of a recipe's ingredients, each once and spelt the way the
+    # ingredients table has it, adding new ingredients to it
+    found = get_ingredients(cursor, names)
+    return [found[ingredient_key(name)][1] for name in unique_names(names)]
+
+def link_ingredients(cursor, recipes, count_usage=True):
+    # 'recipes' is a list of (recipe id, list of ingredient names) for
+    # recipes that have no links yet
+    found = get_ingredients(cursor, [name for _, names in recipes for name in names])
+    rows = [(recipe_id, found[ingredient_key(name)][0]) for recipe_id, names in recipes for name in unique_names(names)]
+    if rows:
+        cursor.executemany("INSERT IGNORE INTO recipe_ingredients (recipe_id, ingredient_id) VALUES (%s, %s)", rows)
+    if count_usage:
+        usage = {}
+        for _, ingredient_id in rows:
+            usage[ingredient_id] = usage.get(ingredient_id, 0) + 1
+        # Sorted by id so concurrent transactions lock rows in the same order
+        cursor.executemany(
+            "UPDATE ingredients SET usage_count = usage_count + %s WHERE id = %s",
+            [(count, ingredient_id) for ingredient_id, count in sorted(usage.items())]
+        )
+
+def unlink_ingredients(cursor, recipe_id):
+    cursor.execute(
+        "UPDATE ingredients SET usage_count = usage_count - 1 "
+        "WHERE id IN (SELECT ingredient_id FROM recipe_ingredients WHERE recipe_id = %s)",
+        (recipe_id,)
+    )
+    cursor.execute("DELETE FROM recipe_ingredients WHERE recipe_id = %s", (recipe_id,))
+
+def migration_done(cursor, name):
+    cursor.execute("SELECT name FROM migrations WHERE name = %s", (name,))
+    return cursor.fetchone() is not None
+
+def mark_migration_done(cursor, name):
+    cursor.execute("INSERT IGNORE INTO migrations (name) VALUES (%s)", (name,))
+
+# Function to fill the ingredient tables from the old Recipes.ingredients text
+def migrate_ingredients(pool, batch_size=BATCH_SIZE):
+    """Link every existing recipe to its ingredients, batch by batch
+
+    Recipes are walked in id order with short transactions, so the app keeps
+    working while this runs; recipes written meanwhile are linked by the
+    normal code paths, and relinking is harmless. Usage counts are worked
+    out once at the end. Safe to run again.
+    """
+    with pool.checkout() as (conn, cursor):
+        links_done = migration_done(cursor, 'recipe_ingredients')
+        counts_done = migration_done(cursor, 'ingredient_usage_counts')
+    if links_done and counts_done:
+        return 0
+
+    migrated = 0
+    last_id = 0
+    while not links_done:
+        with pool.checkout() as (conn, cursor):
+            cursor.execute(
+                "SELECT id, ingredients FROM Recipes WHERE id > %s ORDER BY id LIMIT %s",
+                (last_id, batch_size)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            link_ingredients(cursor, [(recipe_id, split_ingredients(text)) for recipe_id, text in rows],
+                             count_usage=False)
+            conn.commit()
+        migrated += len(rows)
+        last_id = rows[-1][0]
+
+    with pool.checkout() as (conn, cursor):
+        # One statement recounting every ingredient from its links
+        cursor.execute('''UPDATE ingredients SET usage_count = (
+            SELECT COUNT(*) FROM recipe_ingredients ri WHERE ri.ingredient_id = ingredients.id
+        )''')
+        mark_migration_done(cursor, 'recipe_ingredients')
+        mark_migration_done(cursor, 'ingredient_usage_counts')
+        conn.commit()
+    return migrated
+
+def split_ingredients(ingredients_str):
+    # Turn the stored "a, b, c" text back into a list
+    if not ingredients_str:
+        return []
+    return ingredients_str.split(", ")
+
+# Database operations. Each one borrows its own connection from the pool,
+# so they can run from several threads at once.
+
+def insert_recipe(pool, name, cooking_time, ingredients):
+    sql = "INSERT INTO Recipes (name, ingredients, cooking_time, difficulty) VALUES (%s, %s, %s, %s)"
+    with pool.checkout() as (conn, cursor):
+        ingredients = stored_spellings(cursor, ingredients)
+        difficulty = calculate_difficulty(cooking_time, ingredients)
+        val = (name, ", ".join(ingredients), cooking_time, difficulty)
+        cursor.execute(sql, val)
+        recipe_id = cursor.lastrowid
+        link_ingredients(cursor, [(recipe_id, ingredients)])
+        conn.commit()
+    forget_ingredient_completions()
+    return recipe_id
+
+def insert_recipes(pool, recipes, batch_size=BATCH_SIZE):
+    """Insert many recipes, batch_size rows per INSERT and per transaction
+
+    'recipes' is any iterable of dictionaries with 'name', 'cooking_time'
+    and 'ingredients' (a list). Returns (rows inserted, rows per second).
+    """
+    sql = "INSERT INTO Recipes (name, ingredients, cooking_time, difficulty) VALUES (%s, %s, %s, %s)"
+    total = 0
+    started = time.perf_counter()
+    with pool.checkout() as (conn, cursor):
+        batch = []
+        ingredient_lists = []
+        for recipe in recipes:
+            ingredients = unique_names(recipe['ingredients'])
+            ingredient_lists.append(ingredients)
+            batch.append((
+                recipe['name'],
+                ", ".join(ingredients),
+                recipe['cooking_time'],
+                calculate_difficulty(recipe['cooking_time'], ingredients)
+            ))
+            if len(batch) == batch_size:
+                total += insert_batch(conn, cursor, sql, batch, ingredient_lists)
+                batch = []
+                ingredient_lists = []
+        if batch:
+            total += insert_batch(conn, cursor, sql, batch, ingredient_lists)
+    elapsed = time.perf_counter() - started
+    forget_ingredient_completions()
+    return total, total / elapsed if elapsed else 0.0
+
+def insert_batch(conn, cursor, sql, rows, ingredient_lists):
+    # The whole batch is committed as a single transaction together with its
+    # ingredient links. Ingredients are spelt the way the ingredients table
+    # has them
+    found = get_ingredients(cursor, [name for names in ingredient_lists for name in names])
+    ingredient_lists = [[found[ingredient_key(name)][1] for name in names] for names in ingredient_lists]
+    rows = [(name, ", ".join(names), cooking_time, difficulty)
+            for (name, _, cooking_time, difficulty), names in zip(rows, ingredient_lists)]
+    # One INSERT per row, so each lastrowid is that row's own id: the ids of
+    # a multi-row INSERT need not be consecutive (innodb_autoinc_lock_mode=2
+    # interleaves them with other sessions' inserts)
+    recipe_ids = []
+    for row in rows:
+        cursor.execute(sql, row)
+        recipe_ids.append(cursor.lastrowid)
+    link_ingredients(cursor, list(zip(recipe_ids, ingredient_lists)))
+    conn.commit()
+    return len(rows)
+
+def get_all_ingredients(pool, limit=None, offset=0, order_by_popularity=True):
+    """Return [(ingredient, number of recipes using it)] from the database
+
+    Only ingredients used by at least one recipe are listed, most popular
+    first (or by name), optionally one page of 'limit' rows at a time.
+    """
+    order = "usage_count DESC, name" if order_by_popularity else "name"
+    sql = f"SELECT name, usage_count FROM ingredients WHERE usage_count > 0 ORDER BY {order}"
+    params = ()
+    if limit is not None:
+        sql += " LIMIT %s OFFSET %s"
+        params = (limit, offset)
+    with pool.checkout() as (conn, cursor):
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+def get_ingredient_completions(pool):
+    global ingredient_completions
+    if ingredient_completions is None:
+        ingredient_completions = PrefixIndex(dict(get_all_ingredients(pool)))
+    return ingredient_completions
+
+def forget_ingredient_completions():
+    # The usage counts changed: reload them on the next search
+    global ingredient_completions
+    ingredient_completions = None
+
+def find_recipes(pool, ingredient):
+    # Search for recipes through the ingredient tables: an index lookup
+    # instead of a LIKE scan, and "Salt" no longer matches "Salted butter"
+    sql = '''SELECT r.id, r.name, r.ingredients, r.cooking_time, r.difficulty
+        FROM ingredients i
+        JOIN recipe_ingredients ri ON ri.ingredient_id = i.id
+        JOIN Recipes r ON r.id = ri.recipe_id
+        WHERE i.name = %s
+        ORDER BY r.id'''
+    with pool.checkout() as (conn, cursor):
+        cursor.execute(sql, (ingredient,))
+        return cursor.fetchall()
+
+def list_recipes(pool):
+    with pool.checkout() as (conn, cursor):
+        cursor.execute("SELECT id, name FROM Recipes")
+        return cursor.fetchall()
+
+def update_name(pool, recipe_id, new_name):
+    sql = "UPDATE Recipes SET name = %s WHERE id = %s"
+    with pool.checkout() as (conn, cursor):
+        cursor.execute(sql, (new_name, recipe_id))
+        conn.commit()
+
+def update_cooking_time(pool, recipe_id, new_time):
+    """Change a recipe's cooking time; returns False if there is no such recipe"""
+    with pool.checkout() as (conn, cursor):
+        # Get ingredients to recalculate difficulty
+        cursor.execute("SELECT ingredients FROM Recipes WHERE id = %s", (recipe_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return False
+        ingredients_str = row[0]
+        ingredients_list = split_ingredients(ingredients_str)
+        new_difficulty = calculate_difficulty(new_time, ingredients_list)
+
+        sql = "UPDATE Recipes SET cooking_time = %s, difficulty = %s WHERE id = %s"
+        cursor.execute(sql, (new_time, new_difficulty, recipe_id))
+        conn.commit()
+    return True
+
+def update_ingredients(pool, recipe_id, ingredients):
+    """Replace a recipe's ingredients; returns False if there is no such recipe"""
+    with pool.checkout() as (conn, cursor):
+        ingredients = stored_spellings(cursor, ingredients)
+        # Get cooking time to recalculate difficulty
+        cursor.execute("SELECT cooking_time FROM Recipes WHERE id = %s", (recipe_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return False
+        cooking_time = row[0]
+        new_difficulty = calculate_difficulty(cooking_time, ingredients)
+
+        sql = "UPDATE Recipes SET ingredients = %s, difficulty = %s WHERE id = %s"
+        cursor.execute(sql, (", ".join(ingredients), new_difficulty, recipe_id))
+        unlink_ingredients(cursor, recipe_id)
+        link_ingredients(cursor, [(recipe_id, ingredients)])
+        conn.commit()
+    forget_ingredient_completions()
+    return True
+
+def remove_recipe(pool, recipe_id):
+    sql = "DELETE FROM Recipes WHERE id = %s"
+    with pool.checkout() as (conn, cursor):
+        unlink_ingredients(cursor, recipe_id)
+        cursor.execute(sql, (recipe_id,))
+        conn.commit()
+    forget_ingredient_completions()
 
 # Function to create a recipe
-def create_recipe(conn, cursor):
+def create_recipe(pool):
     name = input("Enter recipe name: ")
-    
+
     try:
         cooking_time = int(input("Enter cooking time (minutes): "))
     except ValueError:
         print("Error: Please enter a valid number for cooking time.")
         return
-    
+
     try:
         num_ingredients = int(input("How many ingredients? "))
     except ValueError:
         print("Error: Please enter a valid number for ingredient count.")
         return
-    
+
     ingredients = []
     for i in range(num_ingredients):
         ingredient = input(f"Enter ingredient {i+1}: ")
         ingredients.append(ingredient)
-    
-    difficulty = calculate_difficulty(cooking_time, ingredients)
-    ingredients_str = ", ".join(ingredients)
-    
-    sql = "INSERT INTO Recipes (name, ingredients, cooking_time, difficulty) VALUES (%s, %s, %s, %s)"
-    val = (name, ingredients_str, cooking_time, difficulty)
-    cursor.execute(sql, val)
-    conn.commit()
-    
+
+    insert_recipe(pool, name, cooking_time, ingredients)
+
     print(f"\nRecipe '{name}' added successfully!")
 
 # Function to search recipes
-def search_recipe(conn, cursor):
-    # Get all ingredients from database
-    cursor.execute("SELECT ingredients FROM Recipes")
-    results = cursor.fetchall()
-    
-    all_ingredients = []
-    for row in results:
-        ingredients_list = row[0].split(", ")
-        for ingredient in ingredients_list:
-            if ingredient not in all_ingredients:
-                all_ingredients.append(ingredient)
-    
-    # Display ingredients
-    print("\nAvailable ingredients:")
-    for i, ingredient in enumerate(all_ingredients, 1):
-        print(f"{i}. {ingredient}")
-    
-    try:
-        choice = int(input("\nEnter ingredient number to search: "))
-        search_ingredient = all_ingredients[choice - 1]
-    except ValueError:
-        print("Error: Please enter a valid number.")
-        return
-    except IndexError:
-        print("Error: That number is not in the list.")
+def search_recipe(pool):
+    # Offer the most used ingredients starting with what the user types,
+    # instead of listing them all
+    search_ingredient = choose(get_ingredient_completions(pool))
+    if search_ingredient is None:
         return
-    
-    # Search for recipes - POSSIBLE ERROR FIXED (UPON AI): Using parameterized query
-    sql = "SELECT * FROM Recipes WHERE ingredients LIKE %s"
-    cursor.execute(sql, ('%' + search_ingredient + '%',))
-    results = cursor.fetchall()
-    
+
+    results = find_recipes(pool, search_ingredient)
+
     print(f"\nRecipes with {search_ingredient}:")
     for row in results:
         print(f"\nID: {row[0]}")
@@ -107,96 +417,78 @@ def search_recipe(conn, cursor):
         print(f"Cooking Time: {row[3]} minutes")
         print(f"Difficulty: {row[4]}")
 
-# Function to update a recipe
-def update_recipe(conn, cursor):
-    # Display all recipes
-    cursor.execute("SELECT * FROM Recipes")
-    results = cursor.fetchall()
-    
+# Function to show every recipe's id and name
+def print_recipe_list(pool):
     print("\nAll Recipes:")
-    for row in results:
+    for row in list_recipes(pool):
         print(f"ID: {row[0]} | Name: {row[1]}")
-    
+
+# Function to update a recipe
+def update_recipe(pool):
+    # Display all recipes
+    print_recipe_list(pool)
+
     try:
         recipe_id = int(input("\nEnter recipe ID to update: "))
     except ValueError:
         print("Error: Please enter a valid number.")
         return
-    
+
     print("\nWhat would you like to update?")
     print("1. Name")
     print("2. Cooking Time")
     print("3. Ingredients")
-    
+
     choice = input("Enter choice (1-3): ")
-    
+
     if choice == "1":
         new_name = input("Enter new name: ")
-        sql = "UPDATE Recipes SET name = %s WHERE id = %s"
-        cursor.execute(sql, (new_name, recipe_id))
+        update_name(pool, recipe_id, new_name)
     elif choice == "2":
         try:
             new_time = int(input("Enter new cooking time: "))
         except ValueError:
             print("Error: Please enter a valid number.")
             return
-        
-        # Get ingredients to recalculate difficulty
-        cursor.execute("SELECT ingredients FROM Recipes WHERE id = %s", (recipe_id,))
-        ingredients_str = cursor.fetchone()[0]
-        ingredients_list = ingredients_str.split(", ")
-        new_difficulty = calculate_difficulty(new_time, ingredients_list)
-        
-        sql = "UPDATE Recipes SET cooking_time = %s, difficulty = %s WHERE id = %s"
-        cursor.execute(sql, (new_time, new_difficulty, recipe_id))
+
+        if not update_cooking_time(pool, recipe_id, new_time):
+            print(f"Error: No recipe with ID {recipe_id}.")
+            return
     elif choice == "3":
         try:
             num_ingredients = int(input("How many ingredients? "))
         except ValueError:
             print("Error: Please enter a valid number.")
             return
-        
+
         ingredients = []
         for i in range(num_ingredients):
             ingredient = input(f"Enter ingredient {i+1}: ")
             ingredients.append(ingredient)
-        
-        ingredients_str = ", ".join(ingredients)
-        # Get cooking time to recalculate difficulty
-        cursor.execute("SELECT cooking_time FROM Recipes WHERE id = %s", (recipe_id,))
-        cooking_time = cursor.fetchone()[0]
-        new_difficulty = calculate_difficulty(cooking_time, ingredients)
-        
-        sql = "UPDATE Recipes SET ingredients = %s, difficulty = %s WHERE id = %s"
-        cursor.execute(sql, (ingredients_str, new_difficulty, recipe_id))
-    
-    conn.commit()
+
+        if not update_ingredients(pool, recipe_id, ingredients):
+            print(f"Error: No recipe with ID {recipe_id}.")
+            return
+
     print("\nRecipe updated successfully!")
 
 # Function to delete a recipe
-def delete_recipe(conn, cursor):
+def delete_recipe(pool):
     # Display all recipes
-    cursor.execute("SELECT * FROM Recipes")
-    results = cursor.fetchall()
-    
-    print("\nAll Recipes:")
-    for row in results:
-        print(f"ID: {row[0]} | Name: {row[1]}")
-    
+    print_recipe_list(pool)
+
     try:
         recipe_id = int(input("\nEnter recipe ID to delete: "))
     except ValueError:
         print("Error: Please enter a valid number.")
         return
-    
-    sql = "DELETE FROM Recipes WHERE id = %s"
-    cursor.execute(sql, (recipe_id,))
-    conn.commit()
-    
+
+    remove_recipe(pool, recipe_id)
+
     print("\nRecipe deleted successfully!")
 
 # Main menu
-def main_menu(conn, cursor):
+def main_menu(pool):
     while True:
         print("\n" + "="*40)
         print("RECIPE APP - MAIN MENU")
@@ -206,25 +498,34 @@ def main_menu(conn, cursor):
         print("3. Update an existing recipe")
         print("4. Delete a recipe")
         print("5. Exit")
-        
+
         choice = input("\nEnter your choice (1-5): ")
-        
+
         if choice == "1":
-            create_recipe(conn, cursor)
+            create_recipe(pool)
         elif choice == "2":
-            search_recipe(conn, cursor)
+            search_recipe(pool)
         elif choice == "3":
-            update_recipe(conn, cursor)
+            update_recipe(pool)
         elif choice == "4":
-            delete_recipe(conn, cursor)
+            delete_recipe(pool)
         elif choice == "5":
+            stats = pool.stats()
+            print(f"\nConnection pool: {stats['checkouts']} checkouts, "
+                  f"average wait {stats['average_wait_ms']:.1f} ms, max wait {stats['max_wait_ms']:.1f} ms")
             print("\nExiting... Goodbye!")
             break
         else:
             print("\nInvalid choice. Please try again.")
-    
-    
-    conn.close()
+
+
+    pool.close()
 
 # Run the app
-main_menu(conn, cursor)
\ No newline at end of file
+if __name__ == "__main__":
+    setup_database()
+    pool = create_pool()
+    migrated = migrate_ingredients(pool)
+    if migrated:
+        print(f"Linked {migrated} existing recipes to the ingredient tables.")
+    main_menu(pool)
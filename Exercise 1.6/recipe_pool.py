@@ -0,0 +1,130 @@
+import time
+import queue
+import threading
+from contextlib import contextmanager
+import mysql.connector
+
+# A small pool of MySQL connections shared by the recipe functions.
+# Every operation checks a connection out, uses it with its own cursor and
+# hands it back, so several threads can work on recipes at the same time.
+
+
+class PoolTimeout(Exception):
+    """No connection became free in time"""
+
+
+class RecipePool:
+    def __init__(self, size=5, timeout=30, **connect_args):
+        self.size = size
+        self.timeout = timeout
+        self.connect_args = connect_args
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.created = 0
+        # Metrics about how long callers wait for a connection
+        self.checkouts = 0
+        self.timeouts = 0
+        self.reconnects = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def get_connection(self, timeout):
+        # Reuse an idle connection, open a new one while below 'size',
+        # otherwise wait for one to be handed back
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if self.created < self.size:
+                self.created += 1
+                try:
+                    return mysql.connector.connect(**self.connect_args)
+                except Exception:
+                    self.created -= 1
+                    raise
+        try:
+            return self.idle.get(timeout=timeout)
+        except queue.Empty:
+            with self.lock:
+                self.timeouts += 1
+            raise PoolTimeout(f"No database connection free after {timeout} s")
+
+    def check_health(self, conn):
+        # Make sure the connection is still alive, reconnecting if the
+        # server dropped it
+        if not conn.is_connected():
+            conn.reconnect(attempts=3, delay=1)
+            with self.lock:
+                self.reconnects += 1
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        """Borrow a (connection, cursor) pair for one operation
+
+        Whatever the operation did not commit is rolled back, so the next
+        borrower starts a fresh transaction (and a fresh snapshot). A
+        connection that failed is closed rather than handed back.
+        """
+        started = time.perf_counter()
+        conn = self.get_connection(self.timeout if timeout is None else timeout)
+        waited = time.perf_counter() - started
+        with self.lock:
+            self.checkouts += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+        try:
+            self.check_health(conn)
+        except Exception:
+            # Unusable connection: drop it so a fresh one can take its place
+            self.discard(conn)
+            raise
+
+        cursor = conn.cursor()
+        healthy = False
+        try:
+            yield conn, cursor
+            cursor.close()
+            # Also ends the snapshot a read-only operation left open
+            conn.rollback()
+            healthy = True
+        finally:
+            if healthy:
+                self.idle.put(conn)
+            else:
+                self.discard(conn)
+
+    def discard(self, conn):
+        # Close a connection that may be in a bad state, making room for a new one
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self.lock:
+            self.created -= 1
+
+    def stats(self):
+        """Return the pool's wait-time metrics as a dictionary"""
+        with self.lock:
+            return {
+                'size': self.size,
+                'open_connections': self.created,
+                'idle_connections': self.idle.qsize(),
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'reconnects': self.reconnects,
+                'average_wait_ms': 1000 * self.total_wait / self.checkouts if self.checkouts else 0.0,
+                'max_wait_ms': 1000 * self.max_wait
+            }
+
+    def close(self):
+        # Close every idle connection
+        while True:
+            try:
+                conn = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self.lock:
+                self.created -= 1
@@ -0,0 +1,83 @@
+import os
+import sys
+import time
+import random
+import asyncio
+import tempfile
+from recipe_async import RecipeRepository, MAX_CONCURRENCY
+
+# Benchmark: throughput of the async recipe repository with 1 to 256
+# requests in flight at once.
+# The mix is mostly reads: 70% get, 20% search, 10% create.
+# Usage: python benchmark_recipe_async.py [requests_per_level] [database_url]
+# Runs against a fresh aiosqlite file in a temporary directory by default.
+
+CONCURRENCY_LEVELS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+SEED_RECIPES = 2000
+VOCABULARY = [f"Ingredient {i}" for i in range(200)]
+
+
+def random_ingredients(random_numbers):
+    return random_numbers.sample(VOCABULARY, random_numbers.randint(2, 8))
+
+
+async def seed(repository, recipe_count, random_numbers):
+    for i in range(recipe_count):
+        await repository.create(f"Recipe {i}", random_numbers.randint(1, 120), random_ingredients(random_numbers))
+
+
+async def one_request(repository, random_numbers, recipe_count):
+    choice = random_numbers.random()
+    if choice < 0.7:
+        await repository.get(random_numbers.randint(1, recipe_count))
+    elif choice < 0.9:
+        await repository.search(random_numbers.sample(VOCABULARY, 2), limit=20)
+    else:
+        await repository.create("Benchmark recipe", random_numbers.randint(1, 120), random_ingredients(random_numbers))
+
+
+async def run_level(repository, concurrency, request_count, recipe_count, seed_value):
+    # 'concurrency' workers share the requests, so that many are in flight at once
+    random_numbers = random.Random(seed_value)
+    remaining = iter(range(request_count))
+    latencies = []
+
+    async def worker():
+        for _ in remaining:
+            started = time.perf_counter()
+            await one_request(repository, random_numbers, recipe_count)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return request_count / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+
+async def main(request_count, url):
+    repository = RecipeRepository(url, MAX_CONCURRENCY)
+    await repository.create_tables()
+    random_numbers = random.Random(42)
+    print(f"Seeding {SEED_RECIPES:,} recipes...")
+    await seed(repository, SEED_RECIPES, random_numbers)
+
+    print(f"{request_count:,} requests per level, at most {MAX_CONCURRENCY} on the database at once")
+    print("="*50)
+    print(f"{'in flight':>10} {'requests/s':>12} {'p50 ms':>9} {'p99 ms':>9}")
+    for concurrency in CONCURRENCY_LEVELS:
+        throughput, p50, p99 = await run_level(repository, concurrency, request_count, SEED_RECIPES, concurrency)
+        print(f"{concurrency:>10} {throughput:>12,.0f} {1000 * p50:>9.1f} {1000 * p99:>9.1f}")
+    print("="*50)
+    await repository.close()
+
+
+if __name__ == "__main__":
+    request_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    if len(sys.argv) > 2:
+        asyncio.run(main(request_count, sys.argv[2]))
+    else:
+        # The database is removed with the directory when the run ends
+        with tempfile.TemporaryDirectory() as folder:
+            url = "sqlite+aiosqlite:///" + os.path.join(folder, "benchmark_recipes.db")
+            asyncio.run(main(request_count, url))
@@ -0,0 +1,69 @@
+import os
+import sys
+
+# Checks that the ingredient search and the recipe list are answered through
+# indexes, by reading SQLite's EXPLAIN QUERY PLAN for the queries recipe_app
+# sends. Runs against an in-memory SQLite database.
+# Usage: python check_query_plans.py [number_of_recipes]
+os.environ["RECIPE_APP_DATABASE_URL"] = "sqlite://"
+
+import recipe_app
+from recipe_models import MATCH_ALL, MATCH_ANY, MATCH_AT_LEAST, matching_recipe_ids
+from seed_recipes import seed
+
+LINK_INDEX = "ix_final_recipe_ingredients_ingredient_recipe"
+
+
+def name_index():
+    # SQLite names the index behind a UNIQUE column itself (sqlite_autoindex_...)
+    with recipe_app.engine.connect() as connection:
+        for row in connection.exec_driver_sql("PRAGMA index_list('final_ingredients')"):
+            if row[2]:
+                columns = connection.exec_driver_sql(f"PRAGMA index_info('{row[1]}')").all()
+                if [column[2] for column in columns] == ["name"]:
+                    return row[1]
+    raise LookupError("final_ingredients.name has no unique index")
+
+
+def query_plan(query):
+    # The plan's detail lines, e.g. "SEARCH final_recipes USING INTEGER PRIMARY KEY (rowid>?)"
+    sql = str(query.compile(dialect=recipe_app.engine.dialect, compile_kwargs={"literal_binds": True}))
+    with recipe_app.engine.connect() as connection:
+        return [row[-1] for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + sql)]
+
+
+if __name__ == "__main__":
+    recipe_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    seed(recipe_count)
+    ingredient_index = name_index()
+
+    # (name, query, indexes the plan must use)
+    checks = [
+        ("all ingredients", matching_recipe_ids(["Salt", "Spice 3"], MATCH_ALL), [ingredient_index, LINK_INDEX]),
+        ("any ingredient", matching_recipe_ids(["Salt", "Spice 3"], MATCH_ANY), [ingredient_index, LINK_INDEX]),
+        ("at least 2", matching_recipe_ids(["Salt", "Water", "Spice 3"], MATCH_AT_LEAST, 2),
+         [ingredient_index, LINK_INDEX]),
+        ("first page", recipe_app.page_query(recipe_app.LIST_PAGE_SIZE, 0), []),
+        ("later page", recipe_app.page_query(recipe_app.LIST_PAGE_SIZE, recipe_count // 2), [])
+    ]
+
+    print(f"Query plans over {recipe_count:,} recipes")
+    print("="*50)
+    failed = False
+    for name, query, indexes in checks:
+        plan = query_plan(query)
+        problems = [f"does not use {index}" for index in indexes if not any(index in line for line in plan)]
+        # A full scan of a table (as opposed to a covering index) reads every row
+        problems += [f"scans: {line}" for line in plan
+                     if line.startswith("SCAN final_recipes") or line.startswith("SCAN final_recipe_ingredients")
+                     or line.startswith("SCAN final_ingredients")]
+        if name.endswith("page") and not any(line.startswith("SEARCH final_recipes") for line in plan):
+            problems.append("does not search final_recipes by id")
+        failed = failed or bool(problems)
+        print(f"{name:<16} {'ok' if not problems else 'FAILED'}")
+        for line in plan:
+            print(f"    {line}")
+        for problem in problems:
+            print(f"  ! {problem}")
+    print("="*50)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,74 @@
+import io
+import os
+import sys
+from contextlib import redirect_stdout
+
+# Checks how many SQL statements each menu action of recipe_app sends to the
+# database. Runs against an in-memory SQLite database unless
+# RECIPE_APP_DATABASE_URL points somewhere else.
+# Usage: python check_round_trips.py [number_of_recipes]
+os.environ.setdefault("RECIPE_APP_DATABASE_URL", "sqlite://")
+
+from sqlalchemy import event
+import recipe_app
+import recipe_autocomplete
+from seed_recipes import seed
+
+# Most statements each action may send, however many recipes there are
+ROUND_TRIP_BUDGETS = {
+    "create_recipe": 5,        # vocabulary (cache miss, for spellings), look up
+                               # ingredients, insert ingredients, recipe, links
+    "view_all_recipes": 1,     # first page, then stop
+    "search_by_ingredients": 2,  # vocabulary (if not cached yet), matching recipes
+    "search_again": 1,         # vocabulary from the cache, matching recipes
+    "edit_recipe": 3,          # id/name list, fetch by primary key, update
+    "delete_recipe": 5         # id/name list, fetch, its links, delete links, delete recipe
+}
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self.on_execute)
+
+    def on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def run_action(action, answers, counter):
+    # Run one menu action with scripted answers, returning its statement count
+    answers = iter(answers)
+    recipe_app.input = lambda prompt="": next(answers)
+    # The ingredient typeahead asks its own questions
+    recipe_autocomplete.input = recipe_app.input
+    counter.count = 0
+    with redirect_stdout(io.StringIO()):
+        action()
+    return counter.count
+
+
+if __name__ == "__main__":
+    recipe_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    seed(recipe_count)
+    counter = StatementCounter(recipe_app.engine)
+
+    checks = [
+        ("create_recipe", recipe_app.create_recipe, ["Tea", "5", "2", "Water", "Tea leaves"]),
+        ("view_all_recipes", recipe_app.view_all_recipes, ["q"]),
+        ("search_by_ingredients", recipe_app.search_by_ingredients, ["sa", "1", "wa", "1", "", "1"]),
+        ("search_again", recipe_app.search_by_ingredients, ["tea", "1", ""]),
+        ("edit_recipe", recipe_app.edit_recipe, ["1", "1", "New name"]),
+        ("delete_recipe", recipe_app.delete_recipe, ["2", "yes"])
+    ]
+
+    print(f"Round trips per action, over {recipe_count:,} recipes")
+    print("="*50)
+    failed = False
+    for name, action, answers in checks:
+        count = run_action(action, answers, counter)
+        budget = ROUND_TRIP_BUDGETS[name]
+        status = "ok" if count <= budget else "OVER BUDGET"
+        failed = failed or count > budget
+        print(f"{name:<24} {count} / {budget}  {status}")
+    print("="*50)
+    sys.exit(1 if failed else 0)
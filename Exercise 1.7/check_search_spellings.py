@@ -0,0 +1,104 @@
+import os
+import sys
+import json
+import asyncio
+import tempfile
+import threading
+from http.client import HTTPConnection
+
+# Checks that a search finds recipes whatever the case of the ingredient
+# names, the way saving a recipe already treats them: "water" is stored as
+# the existing "Water", so searching for "water" or "WATER" must find it.
+# Runs the menu app's search, the JSON API and the async service layer
+# against SQLite databases in a temporary directory.
+# Usage: python check_search_spellings.py
+
+folder = tempfile.TemporaryDirectory()
+os.environ["RECIPE_APP_DATABASE_URL"] = "sqlite:///" + os.path.join(folder.name, "app.db")
+os.environ["RECIPE_APP_TEXT_INDEX"] = os.path.join(folder.name, "app.fts")
+
+import recipe_app
+from recipe_models import MATCH_ALL, MATCH_ANY
+from recipe_server import RecipeHTTPServer
+
+
+def check_app():
+    # Saved one at a time like the menu does, searched with other spellings
+    for name, ingredients in [("Tea", ["Water", "Tea leaves"]), ("Soup", ["water", "Salt"])]:
+        recipe = recipe_app.Recipe(name=name, cooking_time=5)
+        recipe_app.set_ingredients(recipe, ingredients)
+        recipe.calculate_difficulty()
+        recipe_app.session.add(recipe)
+        recipe_app.session.commit()
+    return [
+        ("app: water", [r.name for r in recipe_app.search_recipes(["water"])], ["Tea", "Soup"]),
+        ("app: WATER + salt", [r.name for r in recipe_app.search_recipes(["WATER", "salt"])], ["Soup"]),
+        ("app: tea LEAVES or pepper",
+         [r.name for r in recipe_app.search_recipes(["tea LEAVES", "Pepper"], MATCH_ANY)], ["Tea"])
+    ]
+
+
+def check_server():
+    server = RecipeHTTPServer(("127.0.0.1", 0), "sqlite:///" + os.path.join(folder.name, "server.db"), 2)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    connection = HTTPConnection("127.0.0.1", server.server_address[1])
+
+    def request(method, path, body=None):
+        connection.request(method, path, body=json.dumps(body) if body else None,
+                           headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        return json.loads(response.read())
+
+    try:
+        request("POST", "/recipes", {"name": "Tea", "cooking_time": 5, "ingredients": ["Water", "Tea leaves"]})
+        request("POST", "/recipes", {"name": "Soup", "cooking_time": 30, "ingredients": ["water", "Salt"]})
+        found = request("GET", "/search?ingredient=water")["recipes"]
+        found_all = request("GET", "/search?ingredient=WATER&ingredient=salt")["recipes"]
+    finally:
+        connection.close()
+        server.shutdown()
+        thread.join()
+        server.server_close()
+    return [
+        ("server: water", [r["name"] for r in found], ["Tea", "Soup"]),
+        ("server: WATER + salt", [r["name"] for r in found_all], ["Soup"])
+    ]
+
+
+async def check_async():
+    # Needs the aiosqlite driver
+    from recipe_async import RecipeRepository
+    repository = RecipeRepository("sqlite+aiosqlite:///" + os.path.join(folder.name, "async.db"))
+    try:
+        await repository.create_tables()
+        await repository.create("Tea", 5, ["Water", "Tea leaves"])
+        await repository.create("Soup", 30, ["water", "Salt"])
+        found = await repository.search(["water"])
+        found_all = await repository.search(["WATER", "salt"], MATCH_ALL)
+    finally:
+        await repository.close()
+    return [
+        ("async: water", [r["name"] for r in found], ["Tea", "Soup"]),
+        ("async: WATER + salt", [r["name"] for r in found_all], ["Soup"])
+    ]
+
+
+if __name__ == "__main__":
+    checks = check_app() + check_server()
+    try:
+        checks += asyncio.run(check_async())
+    except ImportError as error:
+        print(f"Skipping the async checks: {error}")
+
+    print("Searches with other spellings")
+    print("="*50)
+    failed = False
+    for name, found, expected in checks:
+        ok = found == expected
+        failed = failed or not ok
+        print(f"{name:<28} {'ok' if ok else f'FAILED: got {found}, expected {expected}'}")
+    print("="*50)
+    recipe_app.engine.dispose()
+    folder.cleanup()
+    sys.exit(1 if failed else 0)
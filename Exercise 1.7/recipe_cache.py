@@ -0,0 +1,300 @@
+import os
+import sys
+import json
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # No file locks (Windows): the cache can only be kept per process
+    fcntl = None
+
+# The prefix index and ingredient spelling rules are shared by every
+# exercise: they live at the top of the repository
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from recipe_autocomplete import PrefixIndex
+from recipe_dictionary import ingredient_key
+
+# Read-through cache of the ingredient vocabulary: every ingredient in use,
+# with how many recipes use it.
+#
+# The vocabulary is loaded from the database on the first request (a miss)
+# and then served from memory (a hit). Saved changes patch the counts in
+# place, so the cache does not have to be reloaded after every write.
+#
+# With a shared file, several processes use one copy of the vocabulary:
+#   vocabulary.json          {"generation": 12, "vocabulary": {"Salt": 3, ...}}
+#   vocabulary.json.changes  one line per write since then:
+#                            {"generation": 13, "changes": {"Salt": 1}}
+# Every write bumps the generation and appends its changes to the log, so a
+# write costs as much as the recipe written, not the whole vocabulary.
+# Processes catch up by patching their copy with the lines they haven't
+# seen. Every COMPACT_AFTER_CHANGES writes, the writer folds the log into a
+# new vocabulary.json. A process that reloaded from the database only
+# publishes its copy if nobody wrote in the meantime, and invalidate()
+# publishes "vocabulary": null.
+#
+# completions() serves the same vocabulary as a prefix index for typeahead,
+# and spellings() as {ingredient key: name}, to store a new recipe's
+# ingredients the way they are already spelt. Both are built on the first
+# call after a load and patched along with the counts.
+
+# Writes logged before the log is folded into the vocabulary file
+COMPACT_AFTER_CHANGES = 1000
+
+
+class VocabularyCache:
+    def __init__(self, load, max_size=100_000, shared_file=None):
+        # 'load' returns the vocabulary as a {name: recipe_count} dictionary
+        self.load = load
+        self.max_size = max_size
+        self.shared_file = shared_file if fcntl else None
+        self.lock = threading.Lock()
+        self.counts = None
+        self.names = None
+        self.prefix_index = None
+        self.spelling_map = None
+        # Last write seen, the generation of the vocabulary file, and how
+        # much of the change log was read
+        self.generation = 0
+        self.file_generation = 0
+        self.file_stat = None
+        self.log_offset = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.too_large = 0
+
+    def keep(self, counts):
+        # Keep a vocabulary unless it is over the size bound
+        if counts is not None and len(counts) > self.max_size:
+            self.too_large += 1
+            counts = None
+        self.counts = counts
+        self.names = None
+        self.prefix_index = None
+        self.spelling_map = None
+
+    def current(self):
+        # The vocabulary, loaded on a miss. Called with the lock held; a
+        # vocabulary too large to keep is returned without being kept.
+        if self.shared_file:
+            self.read_shared()
+        if self.counts is not None:
+            self.hits += 1
+            return self.counts
+        self.misses += 1
+        generation = self.generation
+        counts = self.load()
+        self.keep(counts)
+        if self.shared_file and self.counts is not None:
+            self.publish(generation)
+        return counts
+
+    def get(self):
+        """Return the ingredient names, loading them on a miss"""
+        with self.lock:
+            counts = self.current()
+            if counts is not self.counts:
+                return list(counts)
+            if self.names is None:
+                self.names = list(counts)
+            return self.names
+
+    def completions(self):
+        """Return a PrefixIndex over the vocabulary, loading it on a miss"""
+        with self.lock:
+            counts = self.current()
+            if counts is not self.counts:
+                return PrefixIndex(counts)
+            if self.prefix_index is None:
+                self.prefix_index = PrefixIndex(counts)
+            return self.prefix_index
+
+    def spellings(self):
+        """Return {ingredient key: name} over the vocabulary, loading it on a miss
+
+        Returns None when the vocabulary is too large to keep.
+        """
+        with self.lock:
+            counts = self.current()
+            if counts is not self.counts:
+                return None
+            if self.spelling_map is None:
+                self.spelling_map = {}
+                for name in counts:
+                    self.spelling_map.setdefault(ingredient_key(name), name)
+            return self.spelling_map
+
+    def apply(self, changes):
+        """Patch the counts with {name: +n / -n} changes that were just saved"""
+        with self.lock:
+            if self.shared_file:
+                with self.file_lock():
+                    self.catch_up()
+                    self.patch(changes)
+                    self.log_changes(changes)
+                    if self.generation - self.file_generation >= COMPACT_AFTER_CHANGES and self.counts is not None:
+                        self.write_file(self.generation, self.counts)
+            else:
+                self.patch(changes)
+
+    def patch(self, changes):
+        if self.counts is None:
+            return
+        counts = self.counts
+        prefix_index = self.prefix_index
+        spelling_map = self.spelling_map
+        for name, change in changes.items():
+            count = counts.get(name, 0) + change
+            if count > 0:
+                counts[name] = count
+            else:
+                counts.pop(name, None)
+            if prefix_index is not None:
+                prefix_index.set_count(name, count)
+            if spelling_map is not None:
+                key = ingredient_key(name)
+                if count > 0:
+                    spelling_map.setdefault(key, name)
+                elif spelling_map.get(key) == name:
+                    del spelling_map[key]
+        self.keep(counts)
+        if self.counts is not None:
+            # Patched along with the counts: no need to rebuild them
+            self.prefix_index = prefix_index
+            self.spelling_map = spelling_map
+
+    def invalidate(self):
+        """Forget the vocabulary, e.g. after changes made outside the ORM"""
+        with self.lock:
+            self.invalidations += 1
+            self.keep(None)
+            if self.shared_file:
+                with self.file_lock():
+                    self.catch_up()
+                    self.write_file(self.generation + 1, None)
+
+    def stats(self):
+        """Return the cache counters as a dictionary"""
+        with self.lock:
+            return {
+                'ingredients': len(self.counts) if self.counts is not None else 0,
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'too_large': self.too_large,
+                'shared_file': self.shared_file
+            }
+
+    # Shared file helpers
+
+    @contextmanager
+    def file_lock(self):
+        with open(self.shared_file + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def log_name(self):
+        return self.shared_file + '.changes'
+
+    def read_file(self):
+        try:
+            with open(self.shared_file, encoding='utf-8') as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return 0, None
+        return data['generation'], data['vocabulary']
+
+    def write_file(self, generation, counts):
+        # Atomic replace, so readers never see half a file; the log it
+        # folds in is emptied while the lock is held
+        temp_name = f"{self.shared_file}.{os.getpid()}.tmp"
+        with open(temp_name, 'w', encoding='utf-8') as file:
+            json.dump({'generation': generation, 'vocabulary': counts}, file)
+        os.replace(temp_name, self.shared_file)
+        open(self.log_name(), 'w').close()
+        self.generation = self.file_generation = generation
+        self.file_stat = os.stat(self.shared_file)
+        self.log_offset = 0
+
+    def log_changes(self, changes):
+        # One line per write, appended while the lock is held
+        self.generation += 1
+        with open(self.log_name(), 'a', encoding='utf-8') as file:
+            file.write(json.dumps({'generation': self.generation, 'changes': changes}) + '\n')
+            self.log_offset = file.tell()
+
+    def file_changed(self):
+        # Whether the vocabulary file was replaced or the log grew since we
+        # last read them
+        try:
+            stat = os.stat(self.shared_file)
+        except FileNotFoundError:
+            stat = None
+        if (stat is None) != (self.file_stat is None):
+            return True
+        if stat is not None and not (os.path.samestat(stat, self.file_stat)
+                                     and stat.st_mtime_ns == self.file_stat.st_mtime_ns):
+            return True
+        try:
+            return os.path.getsize(self.log_name()) != self.log_offset
+        except FileNotFoundError:
+            return self.log_offset != 0
+
+    def catch_up(self):
+        # Bring our copy up to date with the shared files. Called with the
+        # file lock held
+        if not self.file_changed():
+            return
+        try:
+            stat = os.stat(self.shared_file)
+        except FileNotFoundError:
+            stat = None
+        if stat is not None and not (self.file_stat is not None and os.path.samestat(stat, self.file_stat)
+                                     and stat.st_mtime_ns == self.file_stat.st_mtime_ns):
+            # A new vocabulary file: start from it
+            self.generation, counts = self.read_file()
+            self.file_generation = self.generation
+            self.file_stat = stat
+            self.log_offset = 0
+            self.keep(counts)
+        try:
+            with open(self.log_name(), encoding='utf-8') as file:
+                file.seek(self.log_offset)
+                lines = file.readlines()
+                self.log_offset = file.tell()
+        except FileNotFoundError:
+            lines = []
+        for line in lines:
+            entry = json.loads(line)
+            if entry['generation'] != self.generation + 1:
+                # A gap we can't patch over: drop our copy
+                self.keep(None)
+            else:
+                self.patch(entry['changes'])
+            self.generation = entry['generation']
+
+    def read_shared(self):
+        # Pick up other processes' writes; only takes the lock when the
+        # files changed since we read them
+        if self.file_changed():
+            with self.file_lock():
+                self.catch_up()
+
+    def publish(self, generation):
+        # Share a freshly loaded copy, unless a write happened while loading
+        with self.file_lock():
+            # Writes logged while loading may or may not be in our copy, so
+            # it is set aside rather than patched
+            counts = self.counts
+            self.keep(None)
+            self.catch_up()
+            if self.generation == generation:
+                self.keep(counts)
+                self.write_file(generation, counts)
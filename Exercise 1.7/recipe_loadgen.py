@@ -0,0 +1,153 @@
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import http.client
+from urllib.parse import urlencode
+
+# Load generator for recipe_server.py: several client threads, each on one
+# kept-alive connection, sending a mix of requests and timing every one.
+# The list requests are repeated with If-None-Match, like a caching client.
+# Usage: python recipe_loadgen.py [--port 8000] [--clients 32] [--requests 5000]
+
+REQUEST_MIX = (
+    ("get", 0.5),
+    ("search", 0.25),
+    ("list", 0.2),
+    ("create", 0.05)
+)
+VOCABULARY = [f"Ingredient {i}" for i in range(200)]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class Client(threading.Thread):
+    def __init__(self, host, port, request_count, max_recipe_id, seed):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.request_count = request_count
+        self.max_recipe_id = max_recipe_id
+        self.random_numbers = random.Random(seed)
+        self.etags = {}
+        self.latencies = {kind: [] for kind, _ in REQUEST_MIX}
+        self.statuses = {}
+        self.errors = 0
+
+    def request(self, method, path, body=None):
+        headers = {}
+        if method == "GET" and path in self.etags:
+            headers["If-None-Match"] = self.etags[path]
+        if body is not None:
+            body = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        self.connection.request(method, path, body, headers)
+        response = self.connection.getresponse()
+        response.read()
+        if response.getheader("ETag"):
+            self.etags[path] = response.getheader("ETag")
+        self.statuses[response.status] = self.statuses.get(response.status, 0) + 1
+
+    def next_request(self):
+        kinds = [kind for kind, _ in REQUEST_MIX]
+        kind = self.random_numbers.choices(kinds, [weight for _, weight in REQUEST_MIX])[0]
+        if kind == "get":
+            return kind, "GET", f"/recipes/{self.random_numbers.randint(1, self.max_recipe_id)}", None
+        if kind == "search":
+            ingredients = self.random_numbers.sample(VOCABULARY[:20], 2)
+            query = urlencode([("ingredient", ingredient) for ingredient in ingredients] + [("mode", "any")])
+            return kind, "GET", f"/search?{query}", None
+        if kind == "list":
+            return kind, "GET", f"/recipes?after_id={self.random_numbers.randrange(0, self.max_recipe_id, 20)}", None
+        recipe = {
+            "name": "Load test recipe",
+            "cooking_time": self.random_numbers.randint(1, 120),
+            "ingredients": self.random_numbers.sample(VOCABULARY, 4)
+        }
+        return kind, "POST", "/recipes", recipe
+
+    def run(self):
+        self.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        for _ in range(self.request_count):
+            kind, method, path, body = self.next_request()
+            started = time.perf_counter()
+            try:
+                self.request(method, path, body)
+            except (OSError, http.client.HTTPException):
+                # Dropped connection: count it, the next request reconnects
+                self.errors += 1
+                self.connection.close()
+                continue
+            self.latencies[kind].append(time.perf_counter() - started)
+        self.connection.close()
+
+
+def seed_recipes(host, port, count):
+    # Make sure there is something to read
+    connection = http.client.HTTPConnection(host, port)
+    random_numbers = random.Random(0)
+    for i in range(count):
+        recipe = {
+            "name": f"Recipe {i}",
+            "cooking_time": random_numbers.randint(1, 120),
+            "ingredients": random_numbers.sample(VOCABULARY, random_numbers.randint(2, 8))
+        }
+        connection.request("POST", "/recipes", json.dumps(recipe), {"Content-Type": "application/json"})
+        connection.getresponse().read()
+    connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load generator for recipe_server.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--clients", type=int, default=32, help="concurrent connections (default 32)")
+    parser.add_argument("--requests", type=int, default=5000, help="total requests (default 5000)")
+    parser.add_argument("--seed-recipes", type=int, default=0,
+                        help="create this many recipes before the run")
+    parser.add_argument("--max-recipe-id", type=int, default=1000,
+                        help="GET /recipes/<id> picks ids up to this (default 1000)")
+    args = parser.parse_args()
+
+    if args.seed_recipes:
+        print(f"Seeding {args.seed_recipes:,} recipes...")
+        seed_recipes(args.host, args.port, args.seed_recipes)
+
+    per_client = max(1, args.requests // args.clients)
+    clients = [Client(args.host, args.port, per_client, args.max_recipe_id, seed) for seed in range(args.clients)]
+    started = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - started
+
+    total = per_client * args.clients
+    statuses = {}
+    for client in clients:
+        for status, count in client.statuses.items():
+            statuses[status] = statuses.get(status, 0) + count
+    print(f"{total:,} requests over {args.clients} connections in {elapsed:.2f} s "
+          f"({total / elapsed:,.0f} requests/s)")
+    errors = sum(client.errors for client in clients)
+    print("Status codes: " + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items()))
+          + f", connection errors: {errors}")
+    print("="*50)
+    print(f"{'request':<10} {'count':>8} {'p50 ms':>9} {'p99 ms':>9}")
+    all_latencies = []
+    for kind, _ in REQUEST_MIX:
+        latencies = sorted(latency for client in clients for latency in client.latencies[kind])
+        all_latencies += latencies
+        print(f"{kind:<10} {len(latencies):>8,} {1000 * percentile(latencies, 0.5):>9.1f} "
+              f"{1000 * percentile(latencies, 0.99):>9.1f}")
+    all_latencies.sort()
+    print(f"{'all':<10} {len(all_latencies):>8,} {1000 * percentile(all_latencies, 0.5):>9.1f} "
+          f"{1000 * percentile(all_latencies, 0.99):>9.1f}")
+    print("="*50)
+    sys.exit(1 if errors or any(status >= 500 for status in statuses) else 0)
@@ -0,0 +1,195 @@
+import os
+import sys
+from sqlalchemy import Column, ForeignKey, Index, Table, func, select
+from sqlalchemy.dialects import mysql
+from sqlalchemy.types import Integer, String
+from sqlalchemy.orm import declarative_base, relationship
+
+# The difficulty rules and ingredient spelling rules are shared by every
+# exercise: they live at the top of the repository
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from recipe_difficulty import calculate_difficulty
+from recipe_dictionary import ingredient_key, unique_names
+
+# The recipe tables, shared by the menu app (recipe_app.py) and the async
+# service layer (recipe_async.py).
+
+# Ways of matching several ingredients in matching_recipe_ids()
+MATCH_ALL = "all"
+MATCH_ANY = "any"
+MATCH_AT_LEAST = "at least"
+
+Base = declarative_base()
+
+
+# Which recipe uses which ingredient. The primary key serves "ingredients of
+# a recipe", the second index "recipes with an ingredient".
+recipe_ingredients = Table(
+    "final_recipe_ingredients",
+    Base.metadata,
+    Column("recipe_id", Integer, ForeignKey("final_recipes.id", ondelete="CASCADE"), primary_key=True),
+    Column("ingredient_id", Integer, ForeignKey("final_ingredients.id"), primary_key=True),
+    Index("ix_final_recipe_ingredients_ingredient_recipe", "ingredient_id", "recipe_id"),
+)
+
+
+def format_recipe(recipe):
+    # Works on Recipe objects and on plain rows with the same columns
+    return f"""
+{'='*50}
+Recipe: {recipe.name}
+{'='*50}
+Cooking Time: {recipe.cooking_time} minutes
+Difficulty: {recipe.difficulty}
+Ingredients: {recipe.ingredients}
+{'='*50}
+"""
+
+
+class Ingredient(Base):
+    __tablename__ = "final_ingredients"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # Binary collation on MySQL, so the unique index compares names exactly;
+    # find_or_add_ingredients() is what makes "salt" find "Salt"
+    name = Column(String(255).with_variant(mysql.VARCHAR(255, collation="utf8mb4_bin"), "mysql"),
+                  nullable=False, unique=True)
+
+    recipes = relationship("Recipe", secondary=recipe_ingredients, back_populates="ingredient_items")
+
+    def __repr__(self):
+        return f"<Ingredient ID: {self.id} - {self.name}>"
+
+
+class Recipe(Base):
+    __tablename__ = "final_recipes"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(50))
+    ingredients = Column(String(255))
+    cooking_time = Column(Integer)
+    difficulty = Column(String(20))
+
+    # The same ingredients as rows, for indexed searches; 'ingredients' stays
+    # the text shown to the user
+    ingredient_items = relationship("Ingredient", secondary=recipe_ingredients, back_populates="recipes")
+
+    def __repr__(self):
+        return f"<Recipe ID: {self.id} - {self.name}>"
+    
+    def __str__(self):
+        return format_recipe(self)
+    
+    def calculate_difficulty(self):
+        ingredients_list = self.ingredients.split(", ")
+        self.difficulty = calculate_difficulty(self.cooking_time, len(ingredients_list))
+    
+    def return_ingredients_as_list(self):
+        if self.ingredients == "":
+            return []
+        else:
+            return self.ingredients.split(", ")
+
+
+class Migration(Base):
+    # Data migrations already applied, so they aren't checked for again
+    __tablename__ = "final_migrations"
+
+    name = Column(String(50), primary_key=True)
+
+
+def case_insensitive_lookup(names):
+    # Query for the ingredients spelt like 'names' but for case, for the
+    # names not found as they are. lower() can't use the name index, but
+    # only names that are new or spelt differently get here
+    return (
+        select(Ingredient)
+        .where(func.lower(Ingredient.name).in_([name.lower() for name in names]))
+        .order_by(Ingredient.id)
+    )
+
+
+def find_or_add_ingredients(session, names, spellings=None):
+    """Return the Ingredient rows for these names, adding the missing ones to the session
+
+    Each ingredient is returned once: names differing from each other, or
+    from a stored ingredient, only in case or spacing are the same one.
+    'spellings' ({ingredient key: name}, e.g. from a cache of the ingredients
+    in use) saves querying the database for the other spellings.
+    """
+    names = unique_names(names)
+    if spellings is not None:
+        names = [spellings.get(ingredient_key(name), name) for name in names]
+    found = {}
+    if names:
+        for ingredient in session.scalars(select(Ingredient).where(Ingredient.name.in_(names))):
+            found[ingredient_key(ingredient.name)] = ingredient
+    missing = [name for name in names if ingredient_key(name) not in found]
+    if missing and spellings is None:
+        for ingredient in session.scalars(case_insensitive_lookup(missing)):
+            found.setdefault(ingredient_key(ingredient.name), ingredient)
+    for name in names:
+        if ingredient_key(name) not in found:
+            found[ingredient_key(name)] = Ingredient(name=name)
+            session.add(found[ingredient_key(name)])
+    return [found[ingredient_key(name)] for name in names]
+
+
+def search_names(session, names, spellings=None):
+    """Return ingredient names to search for, spelt the way they are stored
+
+    The same rules as find_or_add_ingredients(), so searching for "salt"
+    finds the recipes saved with "Salt". Names of no stored ingredient are
+    kept as they are (they match no recipe).
+    """
+    names = unique_names(names)
+    if spellings is not None:
+        return [spellings.get(ingredient_key(name), name) for name in names]
+    stored = {}
+    if names:
+        for name in session.scalars(select(Ingredient.name).where(Ingredient.name.in_(names))):
+            stored[ingredient_key(name)] = name
+    missing = [name for name in names if ingredient_key(name) not in stored]
+    if missing:
+        for ingredient in session.scalars(case_insensitive_lookup(missing)):
+            stored.setdefault(ingredient_key(ingredient.name), ingredient.name)
+    return [stored.get(ingredient_key(name), name) for name in names]
+
+
+def recipe_to_dict(recipe):
+    # Plain data for a recipe, e.g. to send as JSON
+    return {
+        "id": recipe.id,
+        "name": recipe.name,
+        "cooking_time": recipe.cooking_time,
+        "difficulty": recipe.difficulty,
+        "ingredients": recipe.return_ingredients_as_list()
+    }
+
+
+def matching_recipe_ids(ingredient_names, mode=MATCH_ALL, minimum=1):
+    """Return a query for the ids of the recipes matching several ingredients
+
+    mode MATCH_ALL: recipes using every ingredient
+    mode MATCH_ANY: recipes using at least one of them
+    mode MATCH_AT_LEAST: recipes using at least 'minimum' of them
+
+    Runs as one join over the ingredient indexes, grouped per recipe with
+    HAVING COUNT(...) instead of one LIKE '%...%' per ingredient. The names
+    are compared exactly: spell them as stored first (see search_names).
+    """
+    names = unique_names(ingredient_names)
+    if mode == MATCH_ALL:
+        required = len(names)
+    elif mode == MATCH_ANY:
+        required = 1
+    else:
+        required = minimum
+
+    return (
+        select(recipe_ingredients.c.recipe_id)
+        .join(Ingredient, Ingredient.id == recipe_ingredients.c.ingredient_id)
+        .where(Ingredient.name.in_(names))
+        .group_by(recipe_ingredients.c.recipe_id)
+        .having(func.count() >= required)
+    )
@@ -0,0 +1,17 @@
+from sqlalchemy import insert
+import recipe_app
+
+# Test data shared by the check scripts (check_round_trips.py,
+# check_query_plans.py). recipe_app connects when imported, so set
+# RECIPE_APP_DATABASE_URL before importing this.
+
+
+def seed(recipe_count):
+    # Fill the database with plain recipes, linked to their ingredients
+    recipe_app.session.execute(insert(recipe_app.Recipe), [
+        {"name": f"Recipe {i}", "cooking_time": i % 30, "difficulty": "Easy",
+         "ingredients": f"Salt, Water, Spice {i % 50}"}
+        for i in range(recipe_count)
+    ])
+    recipe_app.session.commit()
+    recipe_app.link_existing_recipes()
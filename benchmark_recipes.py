@@ -0,0 +1,511 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from itertools import islice
+from datetime import datetime, timezone
+from recipe_difficulty import calculate_difficulty
+
+# Benchmark suite comparing the recipe backends of every exercise on the
+# same seeded synthetic catalog:
+#
+#   pickle      Exercise 1.4: append-only recipe store, ingredient index and
+#               columnar copy
+#   oop         Exercise 1.5: Recipe objects in memory
+#   mysql       Exercise 1.6: raw SQL through recipe_mysql (needs a MySQL
+#               server, see --mysql-database, or --mysql-standin to run it
+#               on SQLite through recipe_mysql_standin.py)
+#   sqlalchemy  Exercise 1.7: recipe_app's ORM, on SQLite unless
+#               --database-url points at a server
+#
+# For every backend and catalog size it times: insert (the whole catalog,
+# through the backend's bulk path), load (open the saved catalog and read
+# every recipe), search (one ingredient), multi_search (recipes with both of
+# two ingredients), update (new cooking time and ingredients) and delete.
+# Operations a backend doesn't have are recorded as unsupported.
+#
+# Every backend and size runs in its own process, so none of them starts
+# with the caches or the memory left behind by another. The results are
+# printed as a table and written to a JSON file for tracking regressions.
+# Usage: python benchmark_recipes.py [--scales 1k 100k] [--backends pickle oop sqlalchemy]
+#                                    [--mysql-standin] [--output benchmark_results.json]
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BACKENDS = ("pickle", "oop", "mysql", "sqlalchemy")
+DEFAULT_BACKENDS = ("pickle", "oop", "sqlalchemy")
+DEFAULT_SCALES = ("1k", "100k")
+OPERATIONS = ("insert", "load", "search", "multi_search", "update", "delete")
+# Timed searches, updates and deletes per run (fewer on tiny catalogs)
+WORKLOAD_OPERATIONS = 100
+INSERT_BATCH_SIZE = 10_000
+RESULTS_VERSION = 1
+
+
+def parse_scale(text):
+    """Turn '1k', '100k', '1m', '10m' or a plain number into a recipe count"""
+    text = text.strip().lower().replace('_', '')
+    multiplier = 1
+    if text.endswith('k'):
+        multiplier, text = 1_000, text[:-1]
+    elif text.endswith('m'):
+        multiplier, text = 1_000_000, text[:-1]
+    return int(float(text) * multiplier)
+
+
+def vocabulary_size(recipe_count):
+    # Bigger catalogs use more distinct ingredients, up to 50,000
+    return min(50_000, max(100, recipe_count // 20))
+
+
+def pick_ingredient(random_numbers, vocabulary):
+    # Skewed towards the first ingredients: a few are in many recipes
+    # (like salt), most in only a handful
+    return vocabulary[int(len(vocabulary) * random_numbers.random() ** 3)]
+
+
+def generate_recipes(recipe_count, seed=42):
+    """Yield 'recipe_count' synthetic recipes, the same ones for the same seed"""
+    random_numbers = random.Random(seed)
+    vocabulary = [f"Ingredient {i}" for i in range(vocabulary_size(recipe_count))]
+    for i in range(recipe_count):
+        ingredients = list(dict.fromkeys(
+            pick_ingredient(random_numbers, vocabulary) for _ in range(random_numbers.randint(2, 10))
+        ))
+        cooking_time = random_numbers.randint(1, 120)
+        yield {
+            'name': f"Recipe {i}",
+            'cooking_time': cooking_time,
+            'ingredients': ingredients,
+            'difficulty': calculate_difficulty(cooking_time, len(ingredients))
+        }
+
+
+def make_workload(recipe_count, seed=42):
+    """Return the seeded searches, updates and deletes to time on a catalog
+
+    Recipes are referred to by their position in the generated catalog.
+    """
+    random_numbers = random.Random(seed + 1)
+    vocabulary = [f"Ingredient {i}" for i in range(vocabulary_size(recipe_count))]
+    count = min(WORKLOAD_OPERATIONS, recipe_count)
+    searches = [pick_ingredient(random_numbers, vocabulary) for _ in range(count)]
+    multi_searches = [
+        list(dict.fromkeys(pick_ingredient(random_numbers, vocabulary) for _ in range(2)))
+        for _ in range(count)
+    ]
+    updates = []
+    for number in random_numbers.sample(range(recipe_count), count):
+        ingredients = random_numbers.sample(vocabulary, random_numbers.randint(2, 10))
+        updates.append((number, random_numbers.randint(1, 120), ingredients))
+    deletes = random_numbers.sample(range(recipe_count), count)
+    return {
+        'search': [(ingredient,) for ingredient in searches],
+        'multi_search': [(ingredients,) for ingredients in multi_searches],
+        'update': updates,
+        'delete': [(number,) for number in deletes]
+    }
+
+
+def batches(recipes, size=INSERT_BATCH_SIZE):
+    recipes = iter(recipes)
+    while True:
+        batch = list(islice(recipes, size))
+        if not batch:
+            return
+        yield batch
+
+
+def use_exercise(folder):
+    # The backends live in the exercise folders, which aren't packages
+    path = os.path.join(ROOT, folder)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+class Unsupported(Exception):
+    """The backend has no such operation"""
+
+
+class BackendUnavailable(Exception):
+    """The backend can't run here (missing driver or server)"""
+
+
+class PickleBackend:
+    """Exercise 1.4: recipes appended to a RecipeStore, searched through its index"""
+
+    def __init__(self, directory, options):
+        use_exercise("Exercise 1.4")
+        from recipe_store import RecipeStore
+        self.store = RecipeStore(os.path.join(directory, "recipes.bin"))
+        self.data = None
+
+    def insert(self, recipes):
+        # Like recipe_input's bulk load: committed batches, then one compaction
+        # (base file, columnar copy and index)
+        for batch in batches(recipes):
+            self.store.append(batch)
+        self.store.compact()
+
+    def load(self):
+        from recipe_columnar import open_columnar
+        self.data, self.index = open_columnar(self.store)
+        return sum(1 for _ in self.data['recipes_list'])
+
+    def search(self, ingredient):
+        from recipe_index import find_positions
+        recipes_list = self.data['recipes_list']
+        return [recipes_list[position] for position in find_positions(self.index, ingredient)]
+
+    def multi_search(self, ingredients):
+        from recipe_index import find_positions_with_all
+        recipes_list = self.data['recipes_list']
+        return [recipes_list[position] for position in find_positions_with_all(self.index, ingredients)]
+
+    def update(self, number, cooking_time, ingredients):
+        raise Unsupported("the append-only store never changes a saved recipe")
+
+    def delete(self, number):
+        raise Unsupported("the append-only store never removes a saved recipe")
+
+    def close(self):
+        if self.data is not None:
+            self.data['recipes_list'].columns.close()
+
+
+class OOPBackend:
+    """Exercise 1.5: Recipe objects in memory, searched recipe by recipe"""
+
+    def __init__(self, directory, options):
+        use_exercise("Exercise 1.5")
+        from recipe_oop import Recipe
+        self.Recipe = Recipe
+        # Recipe objects by catalog position
+        self.recipes = {}
+
+    def insert(self, recipes):
+        for number, data in enumerate(recipes):
+            recipe = self.Recipe(data['name'])
+            recipe.add_ingredients(*data['ingredients'])
+            recipe.set_cooking_time(data['cooking_time'])
+            recipe.calculate_difficulty()
+            self.recipes[number] = recipe
+
+    def load(self):
+        raise Unsupported("recipes only live in memory")
+
+    def search(self, ingredient):
+        return [recipe for recipe in self.recipes.values() if recipe.search_ingredient(ingredient)]
+
+    def multi_search(self, ingredients):
+        return [
+            recipe for recipe in self.recipes.values()
+            if all(recipe.search_ingredient(ingredient) for ingredient in ingredients)
+        ]
+
+    def update(self, number, cooking_time, ingredients):
+        recipe = self.recipes[number]
+        recipe.set_cooking_time(cooking_time)
+        recipe.ingredients = []
+        recipe.add_ingredients(*ingredients)
+        recipe.calculate_difficulty()
+
+    def delete(self, number):
+        del self.recipes[number]
+
+    def close(self):
+        pass
+
+
+class MySQLBackend:
+    """Exercise 1.6: recipe_mysql's functions, on a database of their own"""
+
+    def __init__(self, directory, options):
+        use_exercise("Exercise 1.6")
+        if options.mysql_standin:
+            # SQLite files in this run's directory instead of a server
+            import recipe_mysql_standin
+            recipe_mysql_standin.install(directory)
+        try:
+            import mysql.connector
+            import recipe_mysql
+        except ImportError as error:
+            raise BackendUnavailable(f"{error} (pip install mysql-connector-python, or use --mysql-standin)")
+        self.mysql = recipe_mysql
+        # Never the app's own database: this one is dropped afterwards
+        recipe_mysql.DATABASE = options.mysql_database
+        try:
+            self.drop_database()
+            recipe_mysql.setup_database()
+        except mysql.connector.Error as error:
+            raise BackendUnavailable(f"no MySQL server: {error}")
+        self.pool = recipe_mysql.create_pool()
+
+    def drop_database(self):
+        import mysql.connector
+        conn = mysql.connector.connect(**self.mysql.DB_CONFIG)
+        cursor = conn.cursor()
+        cursor.execute(f"DROP DATABASE IF EXISTS {self.mysql.DATABASE}")
+        cursor.close()
+        conn.close()
+
+    def insert(self, recipes):
+        self.mysql.insert_recipes(self.pool, recipes)
+
+    def load(self):
+        return len(self.mysql.list_recipes(self.pool))
+
+    def search(self, ingredient):
+        return self.mysql.find_recipes(self.pool, ingredient)
+
+    def multi_search(self, ingredients):
+        # No query for several ingredients: intersect the single searches
+        found = {row[0]: row for row in self.mysql.find_recipes(self.pool, ingredients[0])}
+        for ingredient in ingredients[1:]:
+            ids = {row[0] for row in self.mysql.find_recipes(self.pool, ingredient)}
+            found = {recipe_id: row for recipe_id, row in found.items() if recipe_id in ids}
+        return list(found.values())
+
+    def update(self, number, cooking_time, ingredients):
+        # A fresh database numbers the recipes from 1, in insertion order
+        self.mysql.update_cooking_time(self.pool, number + 1, cooking_time)
+        self.mysql.update_ingredients(self.pool, number + 1, ingredients)
+
+    def delete(self, number):
+        self.mysql.remove_recipe(self.pool, number + 1)
+
+    def close(self):
+        self.pool.close()
+        self.drop_database()
+
+
+class SQLAlchemyBackend:
+    """Exercise 1.7: recipe_app's session and functions"""
+
+    def __init__(self, directory, options):
+        # recipe_app connects when imported, so this is set first
+        os.environ["RECIPE_APP_DATABASE_URL"] = options.database_url or \
+            "sqlite:///" + os.path.join(directory, "recipes.db")
+        os.environ["RECIPE_APP_TEXT_INDEX"] = os.path.join(directory, "recipe_text.idx")
+        os.environ.pop("RECIPE_APP_VOCABULARY_FILE", None)
+        use_exercise("Exercise 1.7")
+        import warnings
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            try:
+                import recipe_app
+            except ImportError as error:
+                raise BackendUnavailable(f"{error} (pip install sqlalchemy)")
+        self.app = recipe_app
+        # A server database may hold an earlier run
+        if self.app.has_recipes():
+            raise BackendUnavailable(f"{self.app.DATABASE_URL} already holds recipes")
+        self.ids = []
+
+    def insert(self, recipes):
+        # Like check_round_trips' seeding: plain multi-row inserts, then the
+        # batched linking of recipe_app
+        from sqlalchemy import insert
+        session = self.app.session
+        for batch in batches(recipes):
+            session.execute(insert(self.app.Recipe), [
+                {'name': recipe['name'], 'cooking_time': recipe['cooking_time'],
+                 'ingredients': ", ".join(recipe['ingredients']), 'difficulty': recipe['difficulty']}
+                for recipe in batch
+            ])
+            session.commit()
+        self.app.link_existing_recipes()
+
+    def load(self):
+        self.ids = [row.id for row in self.app.stream_recipes()]
+        return len(self.ids)
+
+    def search(self, ingredient):
+        return self.app.search_recipes([ingredient])
+
+    def multi_search(self, ingredients):
+        return self.app.search_recipes(ingredients, self.app.MATCH_ALL)
+
+    def update(self, number, cooking_time, ingredients):
+        recipe = self.app.session.get(self.app.Recipe, self.ids[number])
+        recipe.cooking_time = cooking_time
+        self.app.set_ingredients(recipe, ingredients)
+        recipe.calculate_difficulty()
+        self.app.session.commit()
+
+    def delete(self, number):
+        recipe = self.app.session.get(self.app.Recipe, self.ids[number])
+        self.app.session.delete(recipe)
+        self.app.session.commit()
+
+    def close(self):
+        self.app.session.close()
+        self.app.engine.dispose()
+
+
+BACKEND_CLASSES = {
+    "pickle": PickleBackend,
+    "oop": OOPBackend,
+    "mysql": MySQLBackend,
+    "sqlalchemy": SQLAlchemyBackend
+}
+
+
+def timing(latencies, rows=None):
+    # Summary of one timed operation
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    result = {
+        'supported': True,
+        'operations': len(latencies),
+        'seconds': round(total, 6),
+        'per_second': round(len(latencies) / total, 1) if total else None,
+        'p50_ms': round(1000 * latencies[len(latencies) // 2], 3),
+        'p99_ms': round(1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 3)
+    }
+    if rows is not None:
+        result['rows'] = rows
+        result['rows_per_second'] = round(rows / total, 1) if total else None
+    return result
+
+
+def run_backend(name, recipe_count, seed, options):
+    """Run every operation on one backend, returning its results"""
+    directory = tempfile.mkdtemp(prefix=f"recipe-benchmark-{name}-")
+    result = {'backend': name, 'scale': recipe_count, 'status': 'ok', 'operations': {}}
+    operations = result['operations']
+    backend = None
+    try:
+        backend = BACKEND_CLASSES[name](directory, options)
+        workload = make_workload(recipe_count, seed)
+
+        started = time.perf_counter()
+        backend.insert(generate_recipes(recipe_count, seed))
+        operations['insert'] = timing([time.perf_counter() - started], rows=recipe_count)
+
+        try:
+            started = time.perf_counter()
+            rows = backend.load()
+            operations['load'] = timing([time.perf_counter() - started], rows=rows)
+        except Unsupported as reason:
+            operations['load'] = {'supported': False, 'reason': str(reason)}
+
+        for operation in OPERATIONS[2:]:
+            function = getattr(backend, operation)
+            latencies = []
+            matches = 0
+            try:
+                for arguments in workload[operation]:
+                    started = time.perf_counter()
+                    found = function(*arguments)
+                    latencies.append(time.perf_counter() - started)
+                    matches += len(found) if found is not None else 0
+            except Unsupported as reason:
+                operations[operation] = {'supported': False, 'reason': str(reason)}
+                continue
+            operations[operation] = timing(latencies)
+            if operation.endswith('search'):
+                operations[operation]['matches'] = matches
+    except BackendUnavailable as reason:
+        result['status'] = 'skipped'
+        result['reason'] = str(reason)
+    except Exception as error:
+        result['status'] = 'failed'
+        result['reason'] = f"{type(error).__name__}: {error}"
+    finally:
+        if backend is not None:
+            try:
+                backend.close()
+            except Exception:
+                pass
+        shutil.rmtree(directory, ignore_errors=True)
+    return result
+
+
+def run_in_subprocess(name, recipe_count, options):
+    # A fresh interpreter per run; the result comes back as the last line
+    command = [sys.executable, os.path.abspath(__file__), "--worker", name, str(recipe_count),
+               "--seed", str(options.seed), "--mysql-database", options.mysql_database]
+    if options.database_url:
+        command += ["--database-url", options.database_url]
+    if options.mysql_standin:
+        command.append("--mysql-standin")
+    completed = subprocess.run(command, stdout=subprocess.PIPE, text=True)
+    lines = completed.stdout.strip().splitlines()
+    try:
+        return json.loads(lines[-1])
+    except (IndexError, ValueError):
+        return {'backend': name, 'scale': recipe_count, 'status': 'failed',
+                'reason': f"worker exited with code {completed.returncode}", 'operations': {}}
+
+
+def print_results(results):
+    print("="*78)
+    print(f"{'backend':<11} {'recipes':>10}  " + " ".join(f"{operation:>9}" for operation in OPERATIONS))
+    print(f"{'':<11} {'':>10}  insert/load in rows/s, the others in ms per operation (p50)")
+    print("-"*78)
+    for result in results:
+        if result['status'] != 'ok':
+            print(f"{result['backend']:<11} {result['scale']:>10,}  {result['status']}: {result['reason']}")
+            continue
+        cells = []
+        for operation in OPERATIONS:
+            measured = result['operations'].get(operation, {})
+            if not measured.get('supported'):
+                cells.append(f"{'-':>9}")
+            elif 'rows_per_second' in measured:
+                cells.append(f"{measured['rows_per_second']:>9,.0f}")
+            else:
+                cells.append(f"{measured['p50_ms']:>9.3f}")
+        print(f"{result['backend']:<11} {result['scale']:>10,}  " + " ".join(cells))
+    print("="*78)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the recipe backends on a synthetic catalog")
+    parser.add_argument("--scales", nargs="+", default=list(DEFAULT_SCALES),
+                        help="catalog sizes, e.g. 1k 100k 1m 10m (default: 1k 100k)")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(DEFAULT_BACKENDS),
+                        help="backends to run (default: pickle oop sqlalchemy)")
+    parser.add_argument("--seed", type=int, default=42, help="seed of the synthetic catalog (default 42)")
+    parser.add_argument("--output", default="benchmark_results.json",
+                        help="JSON file to write the results to (default benchmark_results.json)")
+    parser.add_argument("--database-url", help="database for the sqlalchemy backend (default: SQLite)")
+    parser.add_argument("--mysql-database", default="recipe_benchmark",
+                        help="database the mysql backend creates and drops (default recipe_benchmark)")
+    parser.add_argument("--mysql-standin", action="store_true",
+                        help="run the mysql backend on SQLite (recipe_mysql_standin.py), without a MySQL server")
+    parser.add_argument("--worker", nargs=2, metavar=("BACKEND", "RECIPES"), help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.worker:
+        name, recipe_count = options.worker
+        result = run_backend(name, int(recipe_count), options.seed, options)
+        print(json.dumps(result))
+        sys.exit(0)
+
+    results = []
+    for recipe_count in [parse_scale(scale) for scale in options.scales]:
+        for name in options.backends:
+            print(f"Running {name} on {recipe_count:,} recipes...", file=sys.stderr)
+            results.append(run_in_subprocess(name, recipe_count, options))
+
+    print_results(results)
+    report = {
+        'version': RESULTS_VERSION,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': options.seed,
+        'workload_operations': WORKLOAD_OPERATIONS,
+        'results': results
+    }
+    with open(options.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {options.output}")
+    sys.exit(1 if any(result['status'] == 'failed' for result in results) else 0)
@@ -0,0 +1,165 @@
+import sys
+import time
+import heapq
+import random
+from bisect import bisect_left, insort
+from recipe_fuzzy import FuzzyIndex
+
+# Prefix autocomplete over the ingredient vocabulary, shared by the recipe
+# apps in this repository (Exercise 1.4 to 1.7).
+#
+# Every ingredient is filed under the casefolded start of each of its words,
+# so "oli" and "oil" both complete to "Olive oil". The keys live in one
+# sorted list: the ingredients starting with a prefix are a contiguous range,
+# found by bisecting. Completions are the N most used ingredients of that
+# range, after the ingredient named exactly what was typed, if any. Short
+# prefixes match huge ranges ("s" might match thousands), so their top-N
+# lists are worked out once and kept until the vocabulary changes; longer
+# prefixes only match a handful of keys.
+#
+# When nothing starts with what was typed, similar() offers the ingredients
+# spelt like it instead ("tomatos" -> "Tomatoes"), from a FuzzyIndex built
+# on first use.
+
+COMPLETIONS = 10
+# Ranges with more keys than this get their top-N list cached
+CACHE_RANGE = 256
+
+
+def name_keys(name):
+    # The casefolded name from each of its words on
+    words = name.casefold().split()
+    return [' '.join(words[i:]) for i in range(len(words))] or ['']
+
+
+class PrefixIndex:
+    def __init__(self, counts=None):
+        """Index a {name: usage_count} vocabulary"""
+        self.counts = {}
+        # Sorted (key, name) pairs
+        self.keys = []
+        self.cache = {}
+        self.fuzzy = None
+        if counts:
+            self.counts = {name: count for name, count in counts.items() if count > 0}
+            self.keys = sorted((key, name) for name in self.counts for key in name_keys(name))
+
+    def __len__(self):
+        return len(self.counts)
+
+    def set_count(self, name, count):
+        """Add an ingredient, change its usage count, or remove it (count 0)"""
+        if count > 0 and name not in self.counts:
+            for key in name_keys(name):
+                insort(self.keys, (key, name))
+            if self.fuzzy is not None:
+                self.fuzzy.add(name)
+        elif count <= 0 and name in self.counts:
+            for key in name_keys(name):
+                position = bisect_left(self.keys, (key, name))
+                del self.keys[position]
+            if self.fuzzy is not None:
+                self.fuzzy.remove(name)
+        if count > 0:
+            self.counts[name] = count
+        else:
+            self.counts.pop(name, None)
+        # Cached lists may rank this ingredient differently now
+        self.cache.clear()
+
+    def complete(self, prefix, n=COMPLETIONS):
+        """Return up to n (name, usage_count) pairs starting with 'prefix', most used first
+
+        An ingredient named exactly 'prefix' comes first, however little used.
+        """
+        prefix = ' '.join(prefix.casefold().split())
+        cached = self.cache.get(prefix)
+        if cached is not None and len(cached) >= n:
+            return cached[:n]
+        start = bisect_left(self.keys, (prefix,))
+        # Every key starting with the prefix sorts before prefix + a character
+        # larger than any other
+        end = bisect_left(self.keys, (prefix + '\U0010ffff',), start)
+        # An ingredient filed under two matching keys is offered once
+        names = dict.fromkeys(name for _, name in self.keys[start:end])
+        # The keys equal to the prefix come first in the range; of those, the
+        # ones that are a whole name (not its last words) are exact matches
+        exact = []
+        for key, name in self.keys[start:end]:
+            if key != prefix:
+                break
+            if name_keys(name)[0] == prefix:
+                exact.append(name)
+                del names[name]
+        best = exact + heapq.nsmallest(max(n - len(exact), 0), names, key=lambda name: (-self.counts[name], name))
+        best = best[:n]
+        completions = [(name, self.counts[name]) for name in best]
+        if end - start > CACHE_RANGE:
+            self.cache[prefix] = completions
+        return completions
+
+    def similar(self, text, n=COMPLETIONS):
+        """Return up to n (name, usage_count) pairs spelt like 'text', for "did you mean"
+
+        Returns nothing when NumPy, which the fuzzy index needs, is missing.
+        """
+        if self.fuzzy is None:
+            self.fuzzy = FuzzyIndex(self.counts)
+        try:
+            names = self.fuzzy.suggest(text, n, self.counts)
+        except ImportError:
+            return []
+        return [(name, self.counts[name]) for name in names]
+
+
+def choose(index, what="ingredient", n=COMPLETIONS):
+    """Ask the user for a name, offering completions as they type its start
+
+    Returns the chosen name, or None when the user gives up.
+    """
+    text = input(f"\nType the start of an {what} (Enter to stop): ").strip()
+    while text:
+        completions = index.complete(text, n)
+        if not completions:
+            completions = index.similar(text, n)
+            if not completions:
+                text = input(f"No {what} starts with '{text}'. Try again (Enter to stop): ").strip()
+                continue
+            print(f"No {what} starts with '{text}'. Did you mean:")
+        for i, (name, count) in enumerate(completions, 1):
+            print(f"{i}. {name} ({count} recipes)")
+        choice = input("Pick a number, or type something else to search again: ").strip()
+        if choice.isdigit():
+            if 1 <= int(choice) <= len(completions):
+                return completions[int(choice) - 1][0]
+            print("Error: That number is not in the list.")
+            continue
+        text = choice
+    return None
+
+
+if __name__ == "__main__":
+    # Benchmark: complete prefixes over a large synthetic vocabulary
+    # Usage: python recipe_autocomplete.py [distinct_ingredients]
+    vocabulary_size = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    random_numbers = random.Random(42)
+    syllables = ["sal", "to", "ma", "ba", "sil", "on", "ion", "gar", "lic", "pep", "per", "oil", "ri", "ce"]
+    counts = {}
+    while len(counts) < vocabulary_size:
+        words = [''.join(random_numbers.choices(syllables, k=random_numbers.randint(2, 4)))
+                 for _ in range(random_numbers.randint(1, 3))]
+        counts[' '.join(words).capitalize()] = int(random_numbers.paretovariate(1.2))
+
+    started = time.perf_counter()
+    index = PrefixIndex(counts)
+    print(f"Indexed {len(index):,} ingredients in {1000 * (time.perf_counter() - started):.0f} ms")
+    print("="*50)
+    for prefix in ["s", "sa", "sal", "salto", "oil", "gar lic", "zzz"]:
+        index.complete(prefix)
+        rounds = 1000
+        started = time.perf_counter()
+        for _ in range(rounds):
+            completions = index.complete(prefix)
+        elapsed = (time.perf_counter() - started) / rounds
+        print(f"{prefix!r:<10} {1_000_000 * elapsed:8.1f} us  {completions[:3]}")
+    print("="*50)
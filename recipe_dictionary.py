@@ -0,0 +1,163 @@
+import sys
+import time
+import random
+from array import array
+from bisect import bisect_left
+
+# Canonical ingredient dictionary, shared by the recipe apps in this
+# repository (Exercise 1.4 to 1.7).
+#
+# Ingredients are compared by their key: the name casefolded, with runs of
+# whitespace squeezed to one space, so "Olive  oil" and "olive oil" are the
+# same ingredient. Each key gets a small integer id, in first-seen order,
+# and keeps the spelling it was first seen with for display.
+#
+# A recipe's ingredients are then a sorted array of distinct ids (4 bytes
+# each): checking whether a recipe uses an ingredient is a binary search,
+# and recipes using several ingredients are the intersection of sorted
+# integer lists, never a string comparison.
+
+
+def clean_name(name):
+    """Return an ingredient name with its whitespace tidied up"""
+    return ' '.join(str(name).split())
+
+
+def ingredient_key(name):
+    """Return the key two spellings of the same ingredient share"""
+    return clean_name(name).casefold()
+
+
+def unique_names(names):
+    """Clean a list of ingredient names, dropping empty and repeated ones
+
+    The first spelling of a repeated ingredient is kept.
+    """
+    unique = {}
+    for name in names:
+        name = clean_name(name)
+        if name:
+            unique.setdefault(name.casefold(), name)
+    return list(unique.values())
+
+
+class IngredientDictionary:
+    def __init__(self, names=()):
+        """Start a dictionary, registering 'names' in order"""
+        # key -> id, and the display spelling of every id
+        self.ids = {}
+        self.names = []
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return ingredient_key(name) in self.ids
+
+    def add(self, name):
+        """Return the id of an ingredient, registering it the first time"""
+        key = ingredient_key(name)
+        ingredient_id = self.ids.get(key)
+        if ingredient_id is None:
+            ingredient_id = self.ids[key] = len(self.names)
+            self.names.append(clean_name(name))
+        return ingredient_id
+
+    def get(self, name):
+        """Return the id of an ingredient, or None if it was never registered"""
+        return self.ids.get(ingredient_key(name))
+
+    def name(self, ingredient_id):
+        return self.names[ingredient_id]
+
+    def canonical_name(self, name):
+        """Return the registered spelling of an ingredient, or None"""
+        ingredient_id = self.get(name)
+        return None if ingredient_id is None else self.names[ingredient_id]
+
+    def encode(self, names, add=True):
+        """Return the sorted, distinct ids of some ingredients
+
+        With add=False, ingredients that were never registered are left out.
+        """
+        if add:
+            ids = {self.add(name) for name in names}
+        else:
+            ids = {self.get(name) for name in names}
+            ids.discard(None)
+        return array('I', sorted(ids))
+
+    def decode(self, ids):
+        """Return the names of some ingredient ids"""
+        return [self.names[ingredient_id] for ingredient_id in ids]
+
+
+def contains(sorted_ids, value):
+    """Check whether a sorted array of integers holds 'value'"""
+    position = bisect_left(sorted_ids, value)
+    return position < len(sorted_ids) and sorted_ids[position] == value
+
+
+def intersect(*sorted_lists):
+    """Return the integers found in every one of some sorted lists
+
+    Starts from the shortest list, and looks each of its values up in the
+    others by binary search, each search starting where the last one ended.
+    """
+    if not sorted_lists:
+        return []
+    lists = sorted(sorted_lists, key=len)
+    result = list(lists[0])
+    for other in lists[1:]:
+        kept = []
+        start = 0
+        for value in result:
+            start = bisect_left(other, value, start)
+            if start == len(other):
+                break
+            if other[start] == value:
+                kept.append(value)
+        result = kept
+        if not result:
+            break
+    return result
+
+
+if __name__ == "__main__":
+    # Benchmark: recipes as string lists versus sorted id arrays
+    # Usage: python recipe_dictionary.py [number_of_recipes]
+    recipe_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    random_numbers = random.Random(42)
+    vocabulary = [f"Ingredient {i}" for i in range(5_000)]
+    recipes = [random_numbers.sample(vocabulary, random_numbers.randint(2, 10)) for _ in range(recipe_count)]
+    # Fresh string copies, like ingredients typed in or parsed from a file
+    recipes = [[name.encode().decode() for name in names] for names in recipes]
+
+    dictionary = IngredientDictionary()
+    started = time.perf_counter()
+    encoded = [dictionary.encode(names) for names in recipes]
+    print(f"Encoded {recipe_count:,} recipes in {time.perf_counter() - started:.2f} s")
+    string_bytes = sum(sys.getsizeof(names) + sum(sys.getsizeof(name) for name in names) for names in recipes)
+    id_bytes = sum(sys.getsizeof(ids) for ids in encoded)
+    print(f"Ingredient lists: {string_bytes / 2**20:.1f} MiB as strings, {id_bytes / 2**20:.1f} MiB as ids")
+
+    print("="*50)
+    queries = [random_numbers.sample(vocabulary, 2) for _ in range(20)]
+    started = time.perf_counter()
+    by_name = [sum(1 for names in recipes if first in names and second in names) for first, second in queries]
+    print(f"Two-ingredient scan by name: {1000 * (time.perf_counter() - started) / len(queries):8.2f} ms per query")
+
+    # The same queries through posting lists of sorted recipe numbers, one
+    # per ingredient id
+    postings = {}
+    for number, ids in enumerate(encoded):
+        for ingredient_id in ids:
+            postings.setdefault(ingredient_id, array('I')).append(number)
+    started = time.perf_counter()
+    by_postings = [len(intersect(postings[dictionary.get(first)], postings[dictionary.get(second)]))
+                   for first, second in queries]
+    print(f"Posting list intersection:   {1000 * (time.perf_counter() - started) / len(queries):8.2f} ms per query")
+    assert by_name == by_postings
+    print("="*50)
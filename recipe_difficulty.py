@@ -0,0 +1,49 @@
+# Recipe difficulty rules, shared by every recipe app in this repository
+# (Exercise 1.4 to 1.7).
+#
+#                     fewer ingredients   more ingredients
+#   quick recipe      Easy (0)            Medium (1)
+#   slow recipe       Intermediate (2)    Hard (3)
+#
+# A recipe is "slow" from TIME_THRESHOLD minutes on, and has "more
+# ingredients" from INGREDIENT_THRESHOLD ingredients on. The number in
+# brackets is the difficulty code: 2 * slow + more_ingredients.
+
+DIFFICULTY_LEVELS = ('Easy', 'Medium', 'Intermediate', 'Hard')
+TIME_THRESHOLD = 10
+INGREDIENT_THRESHOLD = 4
+
+
+def difficulty_code(cooking_time, num_ingredients,
+                    time_threshold=TIME_THRESHOLD, ingredient_threshold=INGREDIENT_THRESHOLD):
+    """Return the difficulty code (0-3) of one recipe"""
+    return 2 * (cooking_time >= time_threshold) + (num_ingredients >= ingredient_threshold)
+
+
+def calculate_difficulty(cooking_time, num_ingredients,
+                         time_threshold=TIME_THRESHOLD, ingredient_threshold=INGREDIENT_THRESHOLD):
+    """Return the difficulty name of one recipe"""
+    return DIFFICULTY_LEVELS[difficulty_code(cooking_time, num_ingredients, time_threshold, ingredient_threshold)]
+
+
+def score_batch(cooking_times, ingredient_counts,
+                time_threshold=TIME_THRESHOLD, ingredient_threshold=INGREDIENT_THRESHOLD):
+    """Return the difficulty codes of many recipes at once, as a NumPy uint8 array
+
+    'cooking_times' and 'ingredient_counts' can be NumPy arrays or anything
+    NumPy can read as one (lists, array.array, memoryview columns...).
+    """
+    # NumPy is only needed for batch scoring
+    import numpy as np
+
+    cooking_times = np.asarray(cooking_times)
+    ingredient_counts = np.asarray(ingredient_counts)
+    codes = (cooking_times >= time_threshold).astype(np.uint8)
+    codes <<= 1
+    codes |= ingredient_counts >= ingredient_threshold
+    return codes
+
+
+def difficulty_names(codes):
+    """Turn difficulty codes back into their names"""
+    return [DIFFICULTY_LEVELS[code] for code in codes]
@@ -0,0 +1,259 @@
+import re
+import sys
+import time
+import heapq
+import random
+from array import array
+
+# Typo-tolerant lookup over the ingredient vocabulary, for "did you mean"
+# suggestions when a search finds nothing (Exercise 1.4 to 1.7).
+#
+# Names are split into casefolded words, and every distinct word is indexed
+# by its trigrams (three-letter pieces, padded with spaces at both ends, so
+# "salt" gives "  s", " sa", "sal", "alt", "lt ", "t  "). A word with a
+# typo still shares most of its trigrams with the right one: one edit
+# (adding, dropping or changing a letter, or swapping two neighbours)
+# changes at most four of them. So the candidates for a misspelt word are
+# the indexed words sharing enough of its trigrams, and of a similar length;
+# only those are compared letter by letter (edit distance).
+#
+# A name matches a query when its words are close to the query's words:
+# "potatos" finds "Baked diced potatos" and "Potatoes" alike. Names matching
+# more of the query's words come first, then the closest spellings.
+#
+# The shared trigrams are counted with NumPy, which is imported only when
+# looking for suggestions.
+
+SUGGESTIONS = 5
+# Edits allowed in a word: none in very short words (too many false hits),
+# then one, then two from this length on
+ONE_EDIT_LENGTH = 3
+TWO_EDITS_LENGTH = 7
+# Most candidates compared letter by letter for one word: those sharing the
+# most trigrams with it
+MAX_CHECKED = 64
+
+WORD = re.compile(r"\w+")
+
+
+def words_of(name):
+    return set(WORD.findall(name.casefold()))
+
+
+def trigrams(word):
+    padded = '  ' + word + '  '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_edits(word):
+    if len(word) >= TWO_EDITS_LENGTH:
+        return 2
+    if len(word) >= ONE_EDIT_LENGTH:
+        return 1
+    return 0
+
+
+def edit_distance(first, second, limit):
+    """Edit distance between two words, or limit + 1 once it is over the limit
+
+    Adding, dropping or changing a letter, or swapping two neighbouring
+    letters, counts as one edit.
+    """
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+    # A typo is usually in one place: skip the common start and end
+    start = 0
+    while start < len(first) and start < len(second) and first[start] == second[start]:
+        start += 1
+    end = 0
+    while end < len(first) - start and end < len(second) - start and first[-1 - end] == second[-1 - end]:
+        end += 1
+    first = first[start:len(first) - end]
+    second = second[start:len(second) - end]
+    if not first or not second:
+        return min(len(first) + len(second), limit + 1)
+    # Only the cells within 'limit' of the diagonal can stay under the limit
+    over = limit + 1
+    before = None
+    previous = [j if j <= limit else over for j in range(len(second) + 1)]
+    for i, letter in enumerate(first, 1):
+        low = max(1, i - limit)
+        high = min(len(second), i + limit)
+        current = [over] * (len(second) + 1)
+        if i <= limit:
+            current[0] = i
+        best = current[low - 1]
+        for j in range(low, high + 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (letter != second[j - 1]))
+            if before is not None and j > 1 and letter == second[j - 2] and first[i - 2] == second[j - 1]:
+                cost = min(cost, before[j - 2] + 1)
+            current[j] = cost
+            if cost < best:
+                best = cost
+        if best > limit:
+            return over
+        before = previous
+        previous = current
+    return min(previous[-1], over)
+
+
+class FuzzyIndex:
+    def __init__(self, names=()):
+        """Index some ingredient names"""
+        self.word_ids = {}
+        self.words = []
+        self.first_letters = array('I')
+        # Per word: the names using it
+        self.word_names = []
+        # (trigram, word length) -> word ids, so only words of a close
+        # enough length are ever counted
+        self.postings = {}
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return sum(1 for names in self.word_names if names)
+
+    def add(self, name):
+        for word in words_of(name):
+            word_id = self.word_ids.get(word)
+            if word_id is None:
+                word_id = self.word_ids[word] = len(self.words)
+                self.words.append(word)
+                self.first_letters.append(ord(word[0]))
+                self.word_names.append(set())
+                for trigram in trigrams(word):
+                    key = (trigram, len(word))
+                    if key not in self.postings:
+                        self.postings[key] = array('I')
+                    self.postings[key].append(word_id)
+            self.word_names[word_id].add(name)
+
+    def remove(self, name):
+        # Words no name uses any more stay indexed, but match nothing
+        for word in words_of(name):
+            word_id = self.word_ids.get(word)
+            if word_id is not None:
+                self.word_names[word_id].discard(name)
+
+    def similar_words(self, word):
+        """Return {word id: edit distance} for the indexed words close to 'word'
+
+        Words two edits away are only looked for when none is within one:
+        there are many more of them, and they are rarely what was meant.
+        They must also start with the same letter.
+        """
+        matches = {}
+        word_id = self.word_ids.get(word)
+        if word_id is not None:
+            matches[word_id] = 0
+        for limit in range(1, max_edits(word) + 1):
+            self.add_similar_words(word, limit, matches)
+            if matches:
+                break
+        return matches
+
+    def add_similar_words(self, word, limit, matches):
+        import numpy as np
+
+        grams = trigrams(word)
+        # A word within 'limit' edits misses at most 4 * limit of these
+        needed = max(1, len(grams) - 4 * limit)
+        lists = [np.frombuffer(self.postings[key], dtype=np.uint32)
+                 for length in range(len(word) - limit, len(word) + limit + 1)
+                 for key in ((trigram, length) for trigram in grams)
+                 if key in self.postings]
+        if not lists:
+            return
+        # A word is posted once per trigram, so this counts the shared ones
+        shared = np.bincount(np.concatenate(lists), minlength=len(self.words))
+        keep = shared >= needed
+        if limit > 1:
+            # Like most spell checkers, only trust two edits when the first
+            # letter is right
+            keep &= np.frombuffer(self.first_letters, dtype=np.uint32) == ord(word[0])
+        candidates = np.flatnonzero(keep)
+        if len(candidates) > MAX_CHECKED:
+            candidates = candidates[np.argpartition(-shared[candidates], MAX_CHECKED)[:MAX_CHECKED]]
+        for candidate in candidates.tolist():
+            if candidate in matches or not self.word_names[candidate]:
+                continue
+            distance = edit_distance(word, self.words[candidate], limit)
+            if distance <= limit:
+                matches[candidate] = distance
+
+    def suggest(self, text, n=SUGGESTIONS, popularity=None):
+        """Return up to n names spelt like 'text', best first
+
+        'popularity' ({name: usage_count}) breaks ties in favour of the most
+        used names.
+        """
+        popularity = popularity or {}
+        # name -> [query words matched, total edits]
+        scores = {}
+        for word in words_of(text):
+            closest = {}
+            for word_id, distance in self.similar_words(word).items():
+                for name in self.word_names[word_id]:
+                    if distance < closest.get(name, distance + 1):
+                        closest[name] = distance
+            for name, distance in closest.items():
+                score = scores.setdefault(name, [0, 0])
+                score[0] += 1
+                score[1] += distance
+        return heapq.nsmallest(n, scores, key=lambda name: (
+            -scores[name][0], scores[name][1], -popularity.get(name, 0), name
+        ))
+
+
+if __name__ == "__main__":
+    # Benchmark: suggestions for misspelt words over a large synthetic vocabulary
+    # Usage: python recipe_fuzzy.py [distinct_ingredients]
+    vocabulary_size = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    random_numbers = random.Random(42)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    # Made-up words from consonant-vowel(-consonant) syllables, like "tomalin"
+    consonants = "bcdfghklmnprstvz"
+    vowels = "aeiou"
+    syllables = [c + v for c in consonants for v in vowels] + [c + v + "n" for c in consonants for v in vowels]
+    words = list({''.join(random_numbers.choices(syllables, k=random_numbers.randint(2, 4)))
+                  for _ in range(20_000)})
+    names = set()
+    while len(names) < vocabulary_size:
+        names.add(' '.join(random_numbers.sample(words, random_numbers.randint(1, 3))).capitalize())
+
+    started = time.perf_counter()
+    index = FuzzyIndex(names)
+    print(f"Indexed {len(names):,} ingredients ({len(index.words):,} words) "
+          f"in {time.perf_counter() - started:.2f} s")
+
+    def misspell(word):
+        # One or two random edits
+        for _ in range(random_numbers.randint(1, 2)):
+            position = random_numbers.randrange(len(word))
+            edit = random_numbers.choice(["delete", "insert", "replace"])
+            if edit == "delete" and len(word) > 3:
+                word = word[:position] + word[position + 1:]
+            elif edit == "insert":
+                word = word[:position] + random_numbers.choice(letters) + word[position:]
+            else:
+                word = word[:position] + random_numbers.choice(letters) + word[position + 1:]
+        return word
+
+    queries = [misspell(random_numbers.choice(words)) for _ in range(1000)]
+    queries += [misspell(random_numbers.choice(words)) + ' ' + misspell(random_numbers.choice(words))
+                for _ in range(200)]
+    # The first search imports NumPy
+    index.suggest(queries[0])
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        index.suggest(query)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    print("="*50)
+    print(f"{len(queries):,} misspelt queries: median {1000 * timings[len(timings) // 2]:.2f} ms, "
+          f"p99 {1000 * timings[int(len(timings) * 0.99)]:.2f} ms")
+    for query in queries[:3] + queries[-2:]:
+        print(f"{query!r:<26} -> {index.suggest(query, 3)}")
+    print("="*50)
@@ -0,0 +1,197 @@
+import os
+import re
+import sys
+import types
+import sqlite3
+
+# Stand-in for mysql.connector over SQLite, so Exercise 1.6 (recipe_mysql.py
+# and recipe_pool.py) can run where there is no MySQL server, e.g. in
+# benchmark_recipes.py --mysql-standin.
+#
+# install(directory) registers it as the 'mysql.connector' module. Every
+# MySQL database is then a SQLite file in 'directory' (CREATE DATABASE, USE
+# and DROP DATABASE work on those files), and the statements recipe_mysql
+# sends are rewritten for SQLite on the way:
+#   %s placeholders                    ?
+#   INT AUTO_INCREMENT PRIMARY KEY     INTEGER PRIMARY KEY AUTOINCREMENT
+#   UNIQUE KEY name (column)           UNIQUE (column)
+#   KEY name (columns) in a table      a CREATE INDEX after the table
+#   INSERT IGNORE                      INSERT OR IGNORE
+#   SHOW COLUMNS FROM t LIKE 'c'       PRAGMA table_info
+# It only knows the SQL the exercise uses, and has none of a server's
+# concurrency: SQLite lets one connection write at a time.
+
+# Where install() put the database files
+directory = None
+
+CREATE_TABLE = re.compile(r"CREATE TABLE IF NOT EXISTS (\w+)", re.IGNORECASE)
+UNIQUE_KEY = re.compile(r"UNIQUE KEY \w+ \(([^)]*)\)", re.IGNORECASE)
+TABLE_KEY = re.compile(r",\s*KEY (\w+) \(([^)]*)\)", re.IGNORECASE)
+SHOW_COLUMNS = re.compile(r"SHOW COLUMNS FROM (\w+) LIKE '([^']*)'", re.IGNORECASE)
+DATABASE_STATEMENT = re.compile(r"(CREATE DATABASE IF NOT EXISTS|DROP DATABASE IF EXISTS|USE) (\w+)",
+                                re.IGNORECASE)
+
+
+class Error(Exception):
+    """Any database error, like mysql.connector.Error"""
+
+
+def database_file(name):
+    return os.path.join(directory, name + '.sqlite')
+
+
+def translate(sql):
+    # Return the SQLite statements for one MySQL statement
+    sql = sql.replace('%s', '?')
+    sql = re.sub(r"INT AUTO_INCREMENT PRIMARY KEY", "INTEGER PRIMARY KEY AUTOINCREMENT", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\s*COLLATE utf8mb4_bin", "", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"^INSERT IGNORE", "INSERT OR IGNORE", sql.strip(), flags=re.IGNORECASE)
+    table = CREATE_TABLE.match(sql)
+    if not table:
+        return [sql]
+    sql = UNIQUE_KEY.sub(r"UNIQUE (\1)", sql)
+    indexes = [f"CREATE INDEX IF NOT EXISTS {name} ON {table.group(1)} ({columns})"
+               for name, columns in TABLE_KEY.findall(sql)]
+    return [TABLE_KEY.sub("", sql)] + indexes
+
+
+class Cursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.sqlite = connection.sqlite
+        self.cursor = self.sqlite.cursor()
+        self.rows = None
+        self.first_id = None
+
+    def reopen(self):
+        # After USE the connection is to another file
+        if self.sqlite is not self.connection.sqlite:
+            self.sqlite = self.connection.sqlite
+            self.cursor = self.sqlite.cursor()
+
+    def execute(self, sql, params=()):
+        self.reopen()
+        self.rows = None
+        self.first_id = None
+        database_statement = DATABASE_STATEMENT.match(sql.strip())
+        show_columns = SHOW_COLUMNS.match(sql.strip())
+        try:
+            if database_statement:
+                self.connection.database_statement(*database_statement.groups())
+            elif show_columns:
+                table, column = show_columns.groups()
+                columns = self.cursor.execute(f"PRAGMA table_info({table})").fetchall()
+                self.rows = [row[1:] for row in columns if row[1] == column]
+            else:
+                for statement in translate(sql):
+                    self.cursor.execute(statement, tuple(params))
+        except sqlite3.Error as error:
+            raise Error(str(error)) from error
+
+    def executemany(self, sql, seq_params):
+        self.reopen()
+        self.rows = None
+        self.first_id = None
+        statement = translate(sql)[0]
+        try:
+            if not statement.upper().startswith("INSERT"):
+                self.cursor.executemany(statement, [tuple(params) for params in seq_params])
+                return
+            # MySQL sends the rows as one multi-row INSERT, whose lastrowid
+            # is the id of its first row
+            for params in seq_params:
+                self.cursor.execute(statement, tuple(params))
+                if self.first_id is None:
+                    self.first_id = self.cursor.lastrowid
+        except sqlite3.Error as error:
+            raise Error(str(error)) from error
+
+    def fetchall(self):
+        if self.rows is not None:
+            rows, self.rows = self.rows, []
+            return rows
+        return self.cursor.fetchall()
+
+    def fetchone(self):
+        if self.rows is not None:
+            return self.rows.pop(0) if self.rows else None
+        return self.cursor.fetchone()
+
+    @property
+    def lastrowid(self):
+        if self.first_id is not None:
+            return self.first_id
+        return self.cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self.cursor.rowcount
+
+    def close(self):
+        if self.connection.sqlite is self.sqlite:
+            self.cursor.close()
+
+
+class Connection:
+    def __init__(self, database=None, **settings):
+        # host, user, passwd and the rest only matter to a real server
+        self.sqlite = None
+        self.open(database)
+
+    def open(self, database):
+        if self.sqlite is not None:
+            self.sqlite.close()
+        self.database = database
+        # Without a database (before USE) nothing is stored
+        filename = database_file(database) if database else ":memory:"
+        try:
+            self.sqlite = sqlite3.connect(filename, timeout=30, check_same_thread=False)
+        except sqlite3.Error as error:
+            raise Error(str(error)) from error
+        self.sqlite.execute("PRAGMA foreign_keys = ON")
+
+    def database_statement(self, statement, name):
+        statement = statement.upper()
+        if statement == "USE":
+            self.open(name)
+        elif statement.startswith("DROP"):
+            if os.path.exists(database_file(name)):
+                os.remove(database_file(name))
+        # CREATE DATABASE: the file appears on first use
+
+    def cursor(self, **options):
+        return Cursor(self)
+
+    def commit(self):
+        self.sqlite.commit()
+
+    def rollback(self):
+        self.sqlite.rollback()
+
+    def is_connected(self):
+        return self.sqlite is not None
+
+    def reconnect(self, attempts=1, delay=0):
+        self.open(self.database)
+
+    def close(self):
+        if self.sqlite is not None:
+            self.sqlite.close()
+            self.sqlite = None
+
+
+def connect(database=None, **settings):
+    if directory is None:
+        raise Error("recipe_mysql_standin.install() was not called")
+    return Connection(database, **settings)
+
+
+def install(database_directory):
+    """Make 'import mysql.connector' load this stand-in, keeping databases in 'database_directory'"""
+    global directory
+    directory = database_directory
+    connector = sys.modules[__name__]
+    package = types.ModuleType('mysql')
+    package.connector = connector
+    sys.modules['mysql'] = package
+    sys.modules['mysql.connector'] = connector
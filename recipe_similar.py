@@ -0,0 +1,367 @@
+import os
+import sys
+import time
+import zlib
+import pickle
+import random
+from array import array
+import numpy as np
+from recipe_dictionary import ingredient_key, clean_name
+from recipe_text_search import tokenize
+
+# Near-duplicate and similar-recipe detection with MinHash and LSH (Exercise
+# 1.4).
+#
+# A recipe is a set of features: its ingredients (by ingredient key, so
+# "Olive oil" and "olive  oil" are the same) and the words of its name. How
+# alike two recipes are is the Jaccard similarity of their sets: shared
+# features over all features.
+#
+# Comparing every pair is O(n^2), so each recipe gets a MinHash signature
+# when it is added: for each of SIGNATURE_SIZE hash functions, the smallest
+# hash of any of its features. Two recipes get the same value for one hash
+# function with a probability equal to their Jaccard similarity. Only the
+# low 16 bits of each value are kept (128 bytes per recipe), which barely
+# changes that.
+#
+# Candidates come from LSH banding: the signature is cut into bands of a
+# few values, and recipes whose values agree on a whole band land in the
+# same bucket. Similar recipes share some bucket with high probability,
+# dissimilar ones almost never. The buckets are built from the signatures
+# on the first search, with short bands for similar() and longer ones for
+# duplicates(), and candidates are checked against their exact similarity.
+#
+# Callers import this module only when they need it, since it needs NumPy.
+
+SIGNATURE_SIZE = 64
+# similar(): 32 bands of 2 values. Even recipes a quarter alike usually
+# meet in a bucket, so the top few are nearly always among the candidates
+# (bands of 3 are three times faster, but miss half of those)
+SIMILAR_ROWS = 2
+SIMILAR = 5
+# duplicates(): 12 bands of 5 values, tuned for pairs 80% alike or more
+DUPLICATE_ROWS = 5
+DUPLICATE_THRESHOLD = 0.8
+# Hash functions h(x) = (a * x + b) mod PRIME, over 32-bit feature hashes;
+# the seed is fixed so saved signatures stay comparable
+PRIME = 4294967311
+SEED = 1
+# Recipes hashed per batch (keeps the hash matrix to a few MiB)
+BATCH_SIZE = 4096
+VERSION = 1
+
+
+def recipe_features(name, ingredients):
+    """Return the sorted, distinct 32-bit feature hashes of a recipe"""
+    keys = {'ingredient:' + ingredient_key(ingredient) for ingredient in ingredients if clean_name(ingredient)}
+    keys.update('name:' + word for word in tokenize(name))
+    # crc32 rather than hash(), which changes from one run to the next
+    return sorted({zlib.crc32(key.encode('utf-8')) for key in keys})
+
+
+def band_keys(signatures, start, rows):
+    # One 64-bit key per recipe for the band of 'rows' values from 'start'
+    keys = np.zeros(len(signatures), dtype=np.uint64)
+    for column in range(start, start + rows):
+        # Wrapping multiply-add: keys collide only if the values all match
+        # (or with a chance of about 2 ** -64)
+        keys = keys * np.uint64(0x9E3779B97F4A7C15) + signatures[:, column].astype(np.uint64)
+    return keys
+
+
+class SimilarityIndex:
+    def __init__(self, signature_size=SIGNATURE_SIZE, seed=SEED):
+        random_numbers = np.random.default_rng(seed)
+        self.signature_size = signature_size
+        # a < 2 ** 31, so a * x + b stays within 64 bits
+        self.a = array('Q', random_numbers.integers(1, 2 ** 31, signature_size, dtype=np.uint64).tobytes())
+        self.b = array('Q', random_numbers.integers(0, 2 ** 31, signature_size, dtype=np.uint64).tobytes())
+        # Per document (in the order added): recipe id, features, signature
+        self.doc_ids = array('Q')
+        self.features = array('I')
+        self.offsets = array('Q', [0])
+        self.signatures = array('H')
+        # Free space for callers, saved with the index (e.g. what it covers)
+        self.info = {}
+        # rows -> per band (sorted keys, document numbers), built on the
+        # first search after a change
+        self.buckets = {}
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def signature_matrix(self):
+        return np.frombuffer(self.signatures, dtype=np.uint16).reshape(-1, self.signature_size)
+
+    def document_features(self, number):
+        return self.features[self.offsets[number]:self.offsets[number + 1]]
+
+    def add(self, recipe_id, name, ingredients):
+        """Index one recipe"""
+        self.add_many([(recipe_id, name, ingredients)])
+
+    def add_many(self, recipes):
+        """Index (recipe_id, name, ingredients) tuples, hashing them in batches"""
+        a = np.frombuffer(self.a, dtype=np.uint64)
+        b = np.frombuffer(self.b, dtype=np.uint64)
+        batch = []
+        for recipe in recipes:
+            batch.append(recipe)
+            if len(batch) == BATCH_SIZE:
+                self.add_batch(batch, a, b)
+                batch = []
+        if batch:
+            self.add_batch(batch, a, b)
+
+    def add_batch(self, batch, a, b):
+        feature_lists = [recipe_features(name, ingredients) for _, name, ingredients in batch]
+        lengths = np.array([len(features) for features in feature_lists])
+        values = np.array([value for features in feature_lists for value in features], dtype=np.uint64)
+        # Every hash function over every feature, then the smallest per recipe
+        hashes = (values[:, None] * a + b) % np.uint64(PRIME)
+        signatures = np.full((len(batch), self.signature_size), 0xFFFF, dtype=np.uint16)
+        present = lengths > 0
+        if present.any():
+            starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))[present]
+            signatures[present] = np.minimum.reduceat(hashes, starts, axis=0) & np.uint64(0xFFFF)
+        for (recipe_id, _, _), features in zip(batch, feature_lists):
+            self.doc_ids.append(recipe_id)
+            self.features.extend(features)
+            self.offsets.append(len(self.features))
+        self.signatures.frombytes(signatures.tobytes())
+        self.buckets = {}
+
+    def signature(self, name, ingredients):
+        # Signature of a recipe that need not be indexed
+        features = recipe_features(name, ingredients)
+        if not features:
+            return features, None
+        values = np.array(features, dtype=np.uint64)
+        hashes = (values[:, None] * np.frombuffer(self.a, dtype=np.uint64)
+                  + np.frombuffer(self.b, dtype=np.uint64)) % np.uint64(PRIME)
+        return features, (hashes.min(axis=0) & np.uint64(0xFFFF)).astype(np.uint16)
+
+    def get_buckets(self, rows):
+        # Per band: the band keys of every document with features, sorted,
+        # and the matching document numbers
+        if rows not in self.buckets:
+            signatures = self.signature_matrix()
+            lengths = np.diff(np.frombuffer(self.offsets, dtype=np.uint64))
+            numbers = np.flatnonzero(lengths > 0).astype(np.uint32)
+            bands = []
+            for start in range(0, self.signature_size - rows + 1, rows):
+                keys = band_keys(signatures[numbers], start, rows)
+                order = np.argsort(keys, kind='stable')
+                bands.append((keys[order], numbers[order]))
+            self.buckets[rows] = bands
+        return self.buckets[rows]
+
+    def jaccard(self, features, numbers):
+        # Exact similarity of a feature list to some documents
+        offsets = np.frombuffer(self.offsets, dtype=np.uint64).astype(np.int64)
+        starts = offsets[numbers]
+        lengths = offsets[numbers + 1] - starts
+        # Positions of all their features in self.features, back to back
+        positions = np.arange(lengths.sum()) + np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        shared = np.isin(np.frombuffer(self.features, dtype=np.uint32)[positions], features)
+        intersections = np.bincount(np.repeat(np.arange(len(numbers)), lengths), weights=shared,
+                                    minlength=len(numbers))
+        return intersections / (len(features) + lengths - intersections)
+
+    def similar(self, name, ingredients, k=SIMILAR, exclude=None):
+        """Return up to k (recipe_id, similarity) pairs for the recipes most like this one
+
+        'exclude' is a recipe id to leave out, usually the recipe itself.
+        """
+        features, signature = self.signature(name, ingredients)
+        if signature is None or not len(self):
+            return []
+        candidates = []
+        for band, (keys, numbers) in enumerate(self.get_buckets(SIMILAR_ROWS)):
+            key = band_keys(signature[None, :], band * SIMILAR_ROWS, SIMILAR_ROWS)[0]
+            start = np.searchsorted(keys, key, side='left')
+            end = np.searchsorted(keys, key, side='right')
+            candidates.append(numbers[start:end])
+        candidates = np.unique(np.concatenate(candidates))
+        if exclude is not None:
+            doc_ids = np.frombuffer(self.doc_ids, dtype=np.uint64)
+            candidates = candidates[doc_ids[candidates] != exclude]
+        if not len(candidates):
+            return []
+        similarities = self.jaccard(np.array(features, dtype=np.uint32), candidates)
+        best = np.argsort(-similarities, kind='stable')[:k]
+        return [(self.doc_ids[candidates[i]], float(similarities[i])) for i in best]
+
+    def duplicates(self, threshold=DUPLICATE_THRESHOLD):
+        """Return groups of recipe ids at least 'threshold' alike, oldest first in each
+
+        Recipes sharing a bucket are compared with the first recipe of the
+        bucket: by signature first (cheap, vectorised), then exactly.
+        """
+        signatures = self.signature_matrix()
+        pairs = []
+        for keys, numbers in self.get_buckets(DUPLICATE_ROWS):
+            same = keys[1:] == keys[:-1]
+            if not same.any():
+                continue
+            # First document of the bucket each document is in
+            bucket_starts = np.flatnonzero(np.concatenate(([True], ~same)))
+            firsts = numbers[bucket_starts[np.cumsum(np.concatenate(([True], ~same))) - 1]]
+            followers = np.flatnonzero(np.concatenate(([False], same)))
+            pairs.append(np.stack((firsts[followers], numbers[followers]), axis=1))
+        if not pairs:
+            return []
+        pairs = np.unique(np.concatenate(pairs), axis=0)
+
+        # Share of equal signature values estimates the similarity; keep
+        # some margin, the exact check follows
+        estimates = np.empty(len(pairs))
+        for start in range(0, len(pairs), BATCH_SIZE * 16):
+            chunk = pairs[start:start + BATCH_SIZE * 16]
+            estimates[start:start + len(chunk)] = (signatures[chunk[:, 0]] == signatures[chunk[:, 1]]).mean(axis=1)
+        pairs = pairs[estimates >= threshold - 0.15]
+
+        # Union-find over the pairs that really are alike
+        parents = {}
+
+        def root(number):
+            while parents.get(number, number) != number:
+                number = parents[number]
+            return number
+
+        for first, second in pairs.tolist():
+            first_features = set(self.document_features(first))
+            second_features = set(self.document_features(second))
+            shared = len(first_features & second_features)
+            if shared / (len(first_features) + len(second_features) - shared) >= threshold:
+                first_root, second_root = root(first), root(second)
+                if first_root != second_root:
+                    # The oldest document stays the root
+                    parents[max(first_root, second_root)] = min(first_root, second_root)
+
+        groups = {}
+        for number in parents:
+            groups.setdefault(root(number), set()).add(number)
+        return [[self.doc_ids[number] for number in sorted(members | {first})]
+                for first, members in sorted(groups.items())]
+
+    def save(self, filename):
+        """Write the index to a file (atomically replacing any old one)"""
+        temp_name = filename + '.tmp'
+        state = dict(self.__dict__, buckets={})
+        with open(temp_name, 'wb') as file:
+            pickle.dump((VERSION, state), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_name, filename)
+
+    @classmethod
+    def load(cls, filename):
+        """Read an index saved with save(), returning None if there is none"""
+        try:
+            with open(filename, 'rb') as file:
+                version, state = pickle.load(file)
+        except FileNotFoundError:
+            return None
+        if version != VERSION:
+            return None
+        index = cls()
+        index.__dict__.update(state)
+        return index
+
+
+if __name__ == "__main__":
+    # Benchmark: duplicate detection and similar-recipe search over a
+    # synthetic catalog with planted near-duplicates, against exact answers
+    # Usage: python recipe_similar.py [number_of_recipes]
+    recipe_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    random_numbers = random.Random(42)
+    vocabulary = [f"Ingredient {i}" for i in range(5_000)]
+    weights = [1 / (i + 1) for i in range(len(vocabulary))]
+    words = [f"dish{i}" for i in range(2_000)]
+
+    recipes = []
+    planted = []
+    while len(recipes) < recipe_count:
+        if recipes and random_numbers.random() < 0.05:
+            # A vendor's copy of an earlier recipe, with one small change
+            original = random_numbers.randrange(len(recipes))
+            name, ingredients = recipes[original]
+            ingredients = list(ingredients)
+            change = random_numbers.choice(["same", "case", "add", "drop", "rename"])
+            if change == "case":
+                ingredients = [ingredient.upper() for ingredient in ingredients]
+            elif change == "add":
+                ingredients.append(random_numbers.choices(vocabulary, weights)[0])
+            elif change == "drop" and len(ingredients) > 3:
+                ingredients.pop(random_numbers.randrange(len(ingredients)))
+            elif change == "rename":
+                name = name + " " + random_numbers.choice(words)
+            planted.append((original, len(recipes)))
+            recipes.append((name, ingredients))
+        else:
+            name = ' '.join(random_numbers.sample(words, random_numbers.randint(1, 3)))
+            ingredients = list(set(random_numbers.choices(vocabulary, weights, k=random_numbers.randint(2, 12))))
+            recipes.append((name, ingredients))
+
+    index = SimilarityIndex()
+    started = time.perf_counter()
+    index.add_many((position, name, ingredients) for position, (name, ingredients) in enumerate(recipes))
+    elapsed = time.perf_counter() - started
+    print(f"Signed {recipe_count:,} recipes in {elapsed:.2f} s ({recipe_count / elapsed:,.0f} recipes/s), "
+          f"{(len(index.signatures) * 2 + len(index.features) * 4) / 2**20:.1f} MiB")
+
+    print("="*50)
+    started = time.perf_counter()
+    groups = index.duplicates()
+    elapsed = time.perf_counter() - started
+    group_of = {recipe_id: i for i, group in enumerate(groups) for recipe_id in group}
+    features = [set(recipe_features(name, ingredients)) for name, ingredients in recipes]
+
+    def exact(first, second):
+        return len(features[first] & features[second]) / len(features[first] | features[second])
+
+    eligible = [(first, second) for first, second in planted if exact(first, second) >= DUPLICATE_THRESHOLD]
+    found = sum(1 for first, second in eligible
+                if first in group_of and group_of[first] == group_of.get(second))
+    print(f"duplicates(): {len(groups):,} groups in {elapsed:.2f} s; "
+          f"{found:,} of {len(eligible):,} planted pairs at least {DUPLICATE_THRESHOLD:.0%} alike "
+          f"found ({found / len(eligible):.1%} recall)")
+
+    # similar() against the exact top k, worked out over every recipe
+    print("="*50)
+    queries = random_numbers.sample(range(recipe_count), 200)
+    index.similar(*recipes[queries[0]])
+    timings = []
+    brute_timings = []
+    recall_hits = 0
+    recall_total = 0
+    near_found = 0
+    near_total = 0
+    all_numbers = np.arange(recipe_count)
+    for query in queries:
+        name, ingredients = recipes[query]
+        started = time.perf_counter()
+        results = index.similar(name, ingredients, SIMILAR, exclude=query)
+        timings.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        similarities = index.jaccard(np.array(recipe_features(name, ingredients), dtype=np.uint32), all_numbers)
+        similarities[query] = 0
+        best = np.argsort(-similarities, kind='stable')[:SIMILAR]
+        brute_timings.append(time.perf_counter() - started)
+
+        best = [similarities[i] for i in best if similarities[i] > 0]
+        if best:
+            recall_hits += min(len(best), sum(1 for _, similarity in results if similarity >= best[-1] - 1e-9))
+            recall_total += len(best)
+        near = np.flatnonzero(similarities >= 0.5)
+        found_ids = {recipe_id for recipe_id, _ in index.similar(name, ingredients, len(near) + 1, exclude=query)}
+        near_found += sum(1 for i in near.tolist() if i in found_ids)
+        near_total += len(near)
+    timings.sort()
+    brute_timings.sort()
+    print(f"similar(): median {1000 * timings[len(timings) // 2]:.2f} ms, "
+          f"p99 {1000 * timings[int(len(timings) * 0.99)]:.2f} ms; "
+          f"exact scan: median {1000 * brute_timings[len(brute_timings) // 2]:.2f} ms")
+    print(f"recall@{SIMILAR}: {recall_hits / max(recall_total, 1):.1%}; "
+          f"recipes at least 50% alike found: {near_found / max(near_total, 1):.1%} ({near_total:,})")
+    print("="*50)
@@ -0,0 +1,243 @@
+import os
+import re
+import sys
+import math
+import time
+import pickle
+import random
+from array import array
+from bisect import bisect_left
+
+# Ranked full-text search over recipe names and ingredients, shared by the
+# recipe apps in this repository (Exercise 1.4 and 1.7).
+#
+# Text is split into lowercase words, and each word is lightly stemmed
+# ("tomatoes" -> "tomato", "berries" -> "berry"), so a query matches the
+# usual plural and verb forms. Results are ranked with BM25; words of the
+# recipe name count NAME_WEIGHT times, so a match in the name ranks higher
+# than the same word among the ingredients.
+#
+# The index is an inverted index: for every term, the documents using it and
+# how often. Documents are numbered in the order they were added, and each
+# one remembers the recipe id it stands for. Removing a recipe only marks
+# its document as deleted; compact() (run when saving) drops deleted
+# documents for good. As in most search engines, the statistics (document
+# count, document frequencies) still include deleted documents until then.
+#
+# Searching scores all postings of the query terms at once with NumPy, which
+# is imported only when searching or compacting.
+
+K1 = 1.2
+B = 0.75
+NAME_WEIGHT = 2
+# Compact on save once this share of the documents is deleted
+COMPACT_RATIO = 0.2
+VERSION = 1
+
+WORD = re.compile(r"\w+")
+
+
+def stem(word):
+    """Strip common English plural and verb endings from a lowercase word"""
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith(('ches', 'shes', 'sses', 'xes', 'zes', 'oes')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    if len(word) > 5 and word.endswith('ing'):
+        return word[:-3]
+    if len(word) > 4 and word.endswith('ed'):
+        return word[:-2]
+    return word
+
+
+def tokenize(text):
+    """Return the search terms of a piece of text"""
+    return [stem(word) for word in WORD.findall(text.casefold())]
+
+
+class TextIndex:
+    def __init__(self):
+        # Per document: recipe id, length (in weighted terms), still alive?
+        self.doc_ids = array('Q')
+        self.doc_lengths = array('I')
+        self.alive = bytearray()
+        # term -> (document numbers, term frequencies)
+        self.postings = {}
+        self.total_length = 0
+        self.deleted = 0
+        # Documents added in recipe id order can be found by bisecting
+        # doc_ids; the others (re-added after an edit...) are listed here
+        self.sorted_count = 0
+        self.out_of_order = {}
+        # Free space for callers, saved with the index (e.g. what it covers)
+        self.info = {}
+        # Length normalisation of every document, worked out on the first
+        # search after a change
+        self.norms = None
+
+    def __len__(self):
+        return len(self.doc_ids) - self.deleted
+
+    def find(self, recipe_id):
+        # Document number of a live recipe, or None
+        number = self.out_of_order.get(recipe_id)
+        if number is not None:
+            return number
+        number = bisect_left(self.doc_ids, recipe_id, 0, self.sorted_count)
+        if number < self.sorted_count and self.doc_ids[number] == recipe_id and self.alive[number]:
+            return number
+        return None
+
+    def add(self, recipe_id, name, ingredients):
+        """Index a recipe (replacing any older version of it)"""
+        self.remove(recipe_id)
+        number = len(self.doc_ids)
+        frequencies = {}
+        for term in tokenize(name):
+            frequencies[term] = frequencies.get(term, 0) + NAME_WEIGHT
+        for ingredient in ingredients:
+            for term in tokenize(ingredient):
+                frequencies[term] = frequencies.get(term, 0) + 1
+        for term, frequency in frequencies.items():
+            entry = self.postings.get(term)
+            if entry is None:
+                entry = self.postings[term] = (array('I'), array('B'))
+            entry[0].append(number)
+            entry[1].append(min(frequency, 255))
+        length = sum(frequencies.values())
+        if self.sorted_count == number and (number == 0 or recipe_id > self.doc_ids[-1]):
+            self.sorted_count += 1
+        else:
+            self.out_of_order[recipe_id] = number
+        self.doc_ids.append(recipe_id)
+        self.doc_lengths.append(length)
+        self.alive.append(1)
+        self.total_length += length
+        self.norms = None
+
+    def remove(self, recipe_id):
+        """Forget a recipe, returning whether it was indexed"""
+        number = self.find(recipe_id)
+        if number is None:
+            return False
+        self.alive[number] = 0
+        self.out_of_order.pop(recipe_id, None)
+        self.deleted += 1
+        return True
+
+    def search(self, query, k=10):
+        """Return the k best (recipe_id, score) pairs for a query, best first"""
+        import numpy as np
+
+        count = len(self.doc_ids)
+        terms = dict.fromkeys(tokenize(query))
+        if count == 0 or not terms:
+            return []
+        if self.norms is None:
+            lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32)
+            self.norms = (K1 * (1 - B + B * lengths / (self.total_length / count))).astype(np.float32)
+        scores = np.zeros(count, dtype=np.float32)
+        for term in terms:
+            entry = self.postings.get(term)
+            if entry is None:
+                continue
+            numbers = np.frombuffer(entry[0], dtype=np.uint32)
+            frequencies = np.frombuffer(entry[1], dtype=np.uint8).astype(np.float32)
+            idf = math.log(1 + (count - len(numbers) + 0.5) / (len(numbers) + 0.5))
+            # A document is posted once per term, so plain fancy indexing adds up
+            scores[numbers] += idf * (K1 + 1) * frequencies / (frequencies + self.norms[numbers])
+        if self.deleted:
+            scores *= np.frombuffer(self.alive, dtype=np.uint8)
+
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind='stable')]
+        return [(self.doc_ids[number], float(scores[number])) for number in hits]
+
+    def compact(self):
+        """Drop deleted documents and renumber the others in recipe id order"""
+        import numpy as np
+
+        doc_ids = np.frombuffer(self.doc_ids, dtype=np.uint64)
+        live = np.flatnonzero(np.frombuffer(self.alive, dtype=np.uint8))
+        live = live[np.argsort(doc_ids[live], kind='stable')]
+        renumber = np.full(len(doc_ids), -1, dtype=np.int64)
+        renumber[live] = np.arange(len(live))
+
+        postings = {}
+        for term, (numbers, frequencies) in self.postings.items():
+            new_numbers = renumber[np.frombuffer(numbers, dtype=np.uint32)]
+            keep = new_numbers >= 0
+            if keep.any():
+                postings[term] = (array('I', new_numbers[keep].astype(np.uint32).tobytes()),
+                                  array('B', np.frombuffer(frequencies, dtype=np.uint8)[keep].tobytes()))
+        lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32)[live]
+
+        self.doc_ids = array('Q', doc_ids[live].tobytes())
+        self.doc_lengths = array('I', lengths.tobytes())
+        self.alive = bytearray(b'\x01' * len(live))
+        self.postings = postings
+        self.total_length = int(lengths.sum())
+        self.deleted = 0
+        self.sorted_count = len(live)
+        self.out_of_order = {}
+        self.norms = None
+
+    def save(self, filename):
+        """Write the index to a file (atomically replacing any old one)"""
+        if self.deleted and self.deleted >= COMPACT_RATIO * len(self.doc_ids):
+            self.compact()
+        temp_name = filename + '.tmp'
+        state = dict(self.__dict__, norms=None)
+        with open(temp_name, 'wb') as file:
+            pickle.dump((VERSION, state), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_name, filename)
+
+    @classmethod
+    def load(cls, filename):
+        """Read an index saved with save(), returning None if there is none"""
+        try:
+            with open(filename, 'rb') as file:
+                version, state = pickle.load(file)
+        except FileNotFoundError:
+            return None
+        if version != VERSION:
+            return None
+        index = cls()
+        index.__dict__.update(state)
+        return index
+
+
+if __name__ == "__main__":
+    # Benchmark: build an index over synthetic recipes and time some queries
+    # Usage: python recipe_text_search.py [number_of_recipes]
+    recipe_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    random_numbers = random.Random(42)
+    words = ["tomato", "basil", "garlic", "onion", "chicken", "rice", "lemon", "butter",
+             "flour", "sugar", "egg", "milk", "cheese", "pepper", "salt", "olive oil",
+             "potato", "carrot", "beef", "pasta", "cream", "honey", "ginger", "soy sauce"]
+    words += [f"spice{i}" for i in range(2000)]
+    dishes = ["soup", "salad", "stew", "pie", "cake", "curry", "risotto", "bake", "roast", "tart"]
+
+    print(f"Indexing {recipe_count:,} recipes...")
+    index = TextIndex()
+    started = time.perf_counter()
+    for recipe_id in range(recipe_count):
+        ingredients = random_numbers.sample(words, random_numbers.randint(3, 10))
+        name = f"{ingredients[0].title()} {random_numbers.choice(dishes)}"
+        index.add(recipe_id, name, ingredients)
+    print(f"Indexed in {time.perf_counter() - started:.1f} s, {len(index.postings):,} terms")
+
+    print("="*50)
+    for query in ["tomato soup", "garlic chicken", "lemon cakes", "spice7 spice42 honey", "potatoes"]:
+        index.search(query)
+        started = time.perf_counter()
+        rounds = 20
+        for _ in range(rounds):
+            results = index.search(query, k=10)
+        elapsed = (time.perf_counter() - started) / rounds
+        print(f"{query!r:<24} {1000 * elapsed:7.1f} ms  top: {results[0] if results else None}")
+    print("="*50)